@@ -15,12 +15,16 @@ Containers connect using:
 import argparse
 import asyncio
 import base64
-import hashlib
+import binascii
 import hmac
 import json
 import logging
-import re
+import os
+import signal
+import socket
 import time
+from collections import OrderedDict
+from http import HTTPStatus
 from typing import Optional
 
 import aiohttp
@@ -41,11 +45,216 @@ DEFAULT_ALLOWED_HOSTS = [
     "static.crates.io",
 ]
 
+# Maximum number of verified JWTs kept in the LRU cache
+JWT_CACHE_SIZE = 1024
+
+# Read size for CONNECT tunnels and socket buffer size for upstream connections
+PIPE_CHUNK_SIZE = 64 * 1024
+SOCKET_BUFFER_SIZE = 256 * 1024
+
+# Hop-by-hop headers describe one connection and are never forwarded, along
+# with any header the Connection header names
+HOP_BY_HOP_HEADERS = frozenset({
+    "connection",
+    "keep-alive",
+    "proxy-authenticate",
+    "proxy-authorization",
+    "proxy-connection",
+    "te",
+    "trailer",
+    "transfer-encoding",
+    "upgrade",
+})
+# Headers dropped when forwarding plain HTTP requests and responses; the
+# upstream session and the response stream redo the framing themselves
+HOP_HEADERS_REQUEST = HOP_BY_HOP_HEADERS | {"host"}
+HOP_HEADERS_RESPONSE = HOP_BY_HOP_HEADERS | {"content-encoding", "content-length"}
+
+# Maximum size of a request head read by the front protocol
+MAX_REQUEST_HEAD_SIZE = 64 * 1024
+
+# Compiled allowlist: (exact hosts, wildcard suffixes like ".example.com")
+Allowlist = tuple[frozenset[str], tuple[str, ...]]
+
+
+def _b64url_decode(data: str) -> bytes:
+    """Decode unpadded base64url data as used in JWT segments."""
+    return base64.urlsafe_b64decode(data + "=" * (-len(data) % 4))
+
+
+async def _wait_fd(loop: asyncio.AbstractEventLoop, fd: int, writable: bool = False) -> None:
+    """Wait until a file descriptor is readable (or writable)."""
+    future = loop.create_future()
+
+    def ready() -> None:
+        if not future.done():
+            future.set_result(None)
+
+    if writable:
+        loop.add_writer(fd, ready)
+    else:
+        loop.add_reader(fd, ready)
+    try:
+        await future
+    finally:
+        if writable:
+            loop.remove_writer(fd)
+        else:
+            loop.remove_reader(fd)
+
+
+async def _splice_relay(src: socket.socket, dst: socket.socket) -> None:
+    """Move bytes from src to dst through a kernel pipe (Linux zero-copy)."""
+    loop = asyncio.get_running_loop()
+    src_fd, dst_fd = src.fileno(), dst.fileno()
+    flags = os.SPLICE_F_MOVE | os.SPLICE_F_NONBLOCK
+    pipe_r, pipe_w = os.pipe2(os.O_NONBLOCK | os.O_CLOEXEC)
+    try:
+        while True:
+            try:
+                n = os.splice(src_fd, pipe_w, PIPE_CHUNK_SIZE, flags=flags)
+            except BlockingIOError:
+                await _wait_fd(loop, src_fd)
+                continue
+            if n == 0:
+                break
+            while n > 0:
+                try:
+                    n -= os.splice(pipe_r, dst_fd, n, flags=flags)
+                except BlockingIOError:
+                    await _wait_fd(loop, dst_fd, writable=True)
+    finally:
+        os.close(pipe_r)
+        os.close(pipe_w)
+
+
+async def _copy_relay(src: socket.socket, dst: socket.socket) -> None:
+    """Move bytes from src to dst through userspace buffers."""
+    loop = asyncio.get_running_loop()
+    while data := await loop.sock_recv(src, PIPE_CHUNK_SIZE):
+        await loop.sock_sendall(dst, data)
+
+
+async def _relay(src: socket.socket, dst: socket.socket) -> None:
+    """Relay one direction of a tunnel until EOF, then half-close dst."""
+    try:
+        if hasattr(os, "splice"):
+            await _splice_relay(src, dst)
+        else:
+            await _copy_relay(src, dst)
+    except OSError:
+        pass
+    finally:
+        try:
+            dst.shutdown(socket.SHUT_WR)
+        except OSError:
+            pass
+
+
+def _write_response(transport: asyncio.Transport, status: int, text: str) -> None:
+    """Write a minimal plain-text response and close the connection."""
+    body = text.encode()
+    reason = HTTPStatus(status).phrase
+    transport.write(
+        f"HTTP/1.1 {status} {reason}\r\n"
+        f"Content-Type: text/plain; charset=utf-8\r\n"
+        f"Content-Length: {len(body)}\r\n"
+        f"Connection: close\r\n\r\n".encode()
+        + body
+    )
+    transport.close()
+
+
+async def _open_upstream(host: str, port: int) -> socket.socket:
+    """Open a non-blocking TCP connection to an upstream host."""
+    loop = asyncio.get_running_loop()
+    infos = await loop.getaddrinfo(host, port, type=socket.SOCK_STREAM)
+    error: OSError = OSError(f"Could not resolve {host}")
+    for family, type_, proto, _, addr in infos:
+        sock = socket.socket(family, type_, proto)
+        sock.setblocking(False)
+        try:
+            await loop.sock_connect(sock, addr)
+        except OSError as e:
+            sock.close()
+            error = e
+            continue
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_SNDBUF, SOCKET_BUFFER_SIZE)
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, SOCKET_BUFFER_SIZE)
+        return sock
+    raise error
+
+
+def _end_to_end_headers(headers, dropped: frozenset[str]) -> dict[str, str]:
+    """Copy headers minus those in dropped and those named by Connection."""
+    dropped = dropped | {name.strip().lower() for name in headers.get("Connection", "").split(",")}
+    return {k: v for k, v in headers.items() if k.lower() not in dropped}
+
+
+def _compile_allowlist(hosts: list[str]) -> Allowlist:
+    """Precompute lowercased lookup structures for an allowlist.
+
+    A wildcard entry like *.example.com contributes the suffix .example.com
+    and also allows the bare domain example.com as an exact match.
+    """
+    exact = set()
+    suffixes = []
+    for allowed in hosts:
+        allowed = allowed.lower()
+        if allowed.startswith("*."):
+            suffixes.append(allowed[1:])
+            exact.add(allowed[2:])
+        else:
+            exact.add(allowed)
+    return frozenset(exact), tuple(suffixes)
+
 
 class EgressProxy:
     def __init__(self, signing_key: str, default_allowed_hosts: list[str] | None = None):
         self.signing_key = signing_key
+        self._signing_key_bytes = signing_key.encode()
         self.default_allowed_hosts = default_allowed_hosts or DEFAULT_ALLOWED_HOSTS
+        self._session: aiohttp.ClientSession | None = None
+        self._default_allowlist = _compile_allowlist(self.default_allowed_hosts)
+        self._jwt_cache: OrderedDict[str, tuple[Allowlist, float]] = OrderedDict()
+        self._session_lock = asyncio.Lock()
+        self._runner: web.AppRunner | None = None
+        self._server: asyncio.Server | None = None
+        self._tunnels: set[asyncio.Task] = set()
+        # Client connections not handed to aiohttp: waiting for a request head,
+        # or carrying a CONNECT tunnel
+        self._raw_connections: set[asyncio.Transport] = set()
+
+    async def _get_session(self) -> aiohttp.ClientSession:
+        """Get or create the shared upstream client session.
+
+        Reusing one session keeps upstream connections alive and shares the
+        DNS cache across requests instead of rebuilding them per request.
+        """
+        if self._session is None or self._session.closed:
+            async with self._session_lock:
+                if self._session is None or self._session.closed:
+                    connector = aiohttp.TCPConnector(
+                        limit=1000,
+                        limit_per_host=32,
+                        ttl_dns_cache=300,
+                        enable_cleanup_closed=True,
+                    )
+                    # No cookie jar: the session is shared by every container, and
+                    # cookies are passed through in the forwarded headers anyway
+                    self._session = aiohttp.ClientSession(
+                        connector=connector,
+                        cookie_jar=aiohttp.DummyCookieJar(),
+                        read_bufsize=PIPE_CHUNK_SIZE,
+                    )
+        return self._session
+
+    async def _close_session(self, app: web.Application) -> None:
+        """Close the shared upstream client session on shutdown."""
+        if self._session and not self._session.closed:
+            await self._session.close()
+            self._session = None
 
     def _verify_jwt(self, token: str) -> Optional[dict]:
         """Verify and decode a JWT token."""
@@ -58,24 +267,18 @@ class EgressProxy:
 
             # Verify signature
             message = f"{header_b64}.{payload_b64}"
-            expected_sig = hmac.new(
-                self.signing_key.encode(),
-                message.encode(),
-                hashlib.sha256,
-            ).digest()
-            expected_sig_b64 = base64.urlsafe_b64encode(expected_sig).rstrip(b"=").decode()
-
-            if not hmac.compare_digest(signature_b64, expected_sig_b64):
+            expected_sig = hmac.digest(self._signing_key_bytes, message.encode(), "sha256")
+            try:
+                signature = _b64url_decode(signature_b64)
+            except (binascii.Error, ValueError):
+                # Still run the comparison so malformed signatures take the same path
+                signature = bytes(len(expected_sig))
+
+            if not hmac.compare_digest(signature, expected_sig):
                 logger.warning("JWT signature verification failed")
                 return None
 
-            # Decode payload
-            # Add padding if needed
-            padding = 4 - len(payload_b64) % 4
-            if padding != 4:
-                payload_b64 += "=" * padding
-
-            payload = json.loads(base64.urlsafe_b64decode(payload_b64))
+            payload = json.loads(_b64url_decode(payload_b64))
 
             # Check expiration
             if payload.get("exp", 0) < time.time():
@@ -112,141 +315,151 @@ class EgressProxy:
         except Exception:
             return None
 
-    def _get_allowed_hosts(self, request: web.Request) -> list[str]:
-        """Get allowed hosts from JWT or use defaults."""
-        auth_header = request.headers.get("Proxy-Authorization", "")
-        token = self._extract_token_from_auth(auth_header)
-
-        if token:
-            payload = self._verify_jwt(token)
-            if payload and "allowed_hosts" in payload:
-                hosts = payload["allowed_hosts"]
-                if isinstance(hosts, str):
-                    return [h.strip() for h in hosts.split(",")]
-                return hosts
-
-        return self.default_allowed_hosts
-
-    def _is_host_allowed(self, host: str, allowed_hosts: list[str]) -> bool:
-        """Check if a host is in the allowlist (supports wildcards)."""
-        # Remove port if present
-        if ":" in host:
-            host = host.split(":")[0]
-
-        host = host.lower()
-
-        for allowed in allowed_hosts:
-            allowed = allowed.lower()
+    def _get_allowed_hosts(self, auth_header: str) -> Allowlist:
+        """Get the compiled allowlist from JWT or use defaults."""
+        if not auth_header:
+            return self._default_allowlist
 
-            # Exact match
-            if host == allowed:
-                return True
+        return self._get_auth_allowlist(auth_header)
 
-            # Wildcard match (*.example.com matches sub.example.com)
-            if allowed.startswith("*."):
-                suffix = allowed[1:]  # .example.com
-                if host.endswith(suffix) or host == allowed[2:]:
-                    return True
+    def _get_auth_allowlist(self, auth_header: str) -> Allowlist:
+        """Get the compiled allowlist for an auth header, reusing cached verifications.
 
-        return False
+        Containers present the same Proxy-Authorization header on every request,
+        so the header is decoded and its JWT verified only once until it expires.
+        """
+        cached = self._jwt_cache.get(auth_header)
+        if cached is not None:
+            allowlist, exp = cached
+            if exp > time.time():
+                self._jwt_cache.move_to_end(auth_header)
+                return allowlist
+            del self._jwt_cache[auth_header]
 
-    async def handle_connect(self, request: web.Request) -> web.StreamResponse:
-        """Handle HTTPS CONNECT requests."""
-        # CONNECT requests have the host:port in the path
-        target = request.path_qs
-        if ":" in target:
-            host, port = target.rsplit(":", 1)
-            port = int(port)
+        token = self._extract_token_from_auth(auth_header)
+        payload = self._verify_jwt(token) if token else None
+        if not payload:
+            return self._default_allowlist
+
+        if "allowed_hosts" in payload:
+            hosts = payload["allowed_hosts"]
+            if isinstance(hosts, str):
+                hosts = [h.strip() for h in hosts.split(",")]
+            allowlist = _compile_allowlist(hosts)
         else:
-            host = target
-            port = 443
+            allowlist = self._default_allowlist
 
-        allowed_hosts = self._get_allowed_hosts(request)
+        self._jwt_cache[auth_header] = (allowlist, payload.get("exp", 0))
+        if len(self._jwt_cache) > JWT_CACHE_SIZE:
+            self._jwt_cache.popitem(last=False)
+        return allowlist
 
-        if not self._is_host_allowed(host, allowed_hosts):
+    def _is_host_allowed(self, host: str, allowlist: Allowlist) -> bool:
+        """Check if a host is in the allowlist (supports wildcards)."""
+        # Remove port if present
+        host = host.partition(":")[0].lower()
+
+        exact, suffixes = allowlist
+        if host in exact:
+            return True
+
+        # Most allowlists have no wildcards; skip building the suffix scan
+        if not suffixes:
+            return False
+
+        # Wildcard match (*.example.com matches sub.example.com)
+        return any(host.endswith(suffix) for suffix in suffixes)
+
+    async def handle_connect(
+        self, transport: asyncio.Transport, head: bytes, pending: bytes
+    ) -> None:
+        """Handle an HTTPS CONNECT request read by the front protocol.
+
+        Args:
+            transport: Client transport, with reading paused.
+            head: Request line and headers, without the terminating blank line.
+            pending: Bytes the client sent after the request head.
+        """
+        lines = head.decode("latin-1").split("\r\n")
+        auth_header = ""
+        for line in lines[1:]:
+            name, _, value = line.partition(":")
+            if name.strip().lower() == "proxy-authorization":
+                auth_header = value.strip()
+                break
+
+        # CONNECT requests have the host:port as the request target
+        try:
+            target = lines[0].split(" ", 2)[1]
+            if ":" in target:
+                host, port = target.rsplit(":", 1)
+                port = int(port)
+            else:
+                host = target
+                port = 443
+        except (IndexError, ValueError):
+            _write_response(transport, 400, "Invalid CONNECT request")
+            return
+
+        allowlist = self._get_allowed_hosts(auth_header)
+
+        if not self._is_host_allowed(host, allowlist):
             logger.warning(f"Blocked CONNECT to {host}:{port}")
-            return web.Response(
-                status=403,
-                text=f"Host not allowed: {host}",
-            )
+            _write_response(transport, 403, f"Host not allowed: {host}")
+            return
 
         logger.info(f"Proxying CONNECT to {host}:{port}")
 
         try:
             # Connect to target
-            reader, writer = await asyncio.open_connection(host, port)
-
-            # Send 200 Connection Established
-            response = web.StreamResponse(
-                status=200,
-                reason="Connection Established",
-            )
-            response.force_close()
-            await response.prepare(request)
+            upstream = await _open_upstream(host, port)
+        except Exception as e:
+            logger.error(f"CONNECT error to {host}:{port}: {e}")
+            _write_response(transport, 502, f"Failed to connect: {e}")
+            return
 
-            # Get the underlying transport
-            transport = request.transport
+        # Relay on a duplicate of the client socket so both directions are
+        # moved in the kernel without passing through Python buffers
+        loop = asyncio.get_running_loop()
+        client = socket.socket(fileno=os.dup(transport.get_extra_info("socket").fileno()))
+        client.setblocking(False)
 
-            # Bidirectional pipe
-            async def pipe(reader, writer):
-                try:
-                    while True:
-                        data = await reader.read(8192)
-                        if not data:
-                            break
-                        writer.write(data)
-                        await writer.drain()
-                except Exception:
-                    pass
-                finally:
-                    try:
-                        writer.close()
-                    except Exception:
-                        pass
-
-            # Create tasks for bidirectional copying
-            client_reader = request.content
+        try:
+            await loop.sock_sendall(client, b"HTTP/1.1 200 Connection Established\r\n\r\n")
+            if pending:
+                await loop.sock_sendall(upstream, pending)
             await asyncio.gather(
-                pipe(client_reader, writer),
-                pipe(reader, response),
-                return_exceptions=True,
-            )
-
-            return response
-
-        except Exception as e:
-            logger.error(f"CONNECT error to {host}:{port}: {e}")
-            return web.Response(
-                status=502,
-                text=f"Failed to connect: {e}",
+                _relay(client, upstream),
+                _relay(upstream, client),
             )
-
-    async def handle_request(self, request: web.Request) -> web.Response:
+        except OSError as e:
+            logger.warning(f"CONNECT tunnel to {host}:{port} closed: {e}")
+        finally:
+            client.close()
+            upstream.close()
+            transport.close()
+
+    async def handle_request(self, request: web.Request) -> web.StreamResponse:
         """Handle regular HTTP proxy requests."""
-        # For CONNECT method, use special handler
-        if request.method == "CONNECT":
-            return await self.handle_connect(request)
-
-        # Get the target URL from the request
-        url = request.path_qs
+        # Get the target URL from the request (absolute-form request target)
+        url = request.raw_path
         if not url.startswith("http://"):
             return web.Response(
                 status=400,
                 text="Invalid proxy request",
             )
 
-        # Parse host from URL
-        match = re.match(r"http://([^/:]+)", url)
-        if not match:
+        # Parse host from URL (string ops are cheaper than a regex here)
+        host = url[7:].partition("/")[0].partition(":")[0]
+        if not host:
             return web.Response(
                 status=400,
                 text="Could not parse host from URL",
             )
 
-        host = match.group(1)
-        allowed_hosts = self._get_allowed_hosts(request)
+        allowlist = self._get_allowed_hosts(request.headers.get("Proxy-Authorization", ""))
 
-        if not self._is_host_allowed(host, allowed_hosts):
+        if not self._is_host_allowed(host, allowlist):
             logger.warning(f"Blocked request to {host}")
             return web.Response(
                 status=403,
@@ -256,48 +469,155 @@ class EgressProxy:
         logger.info(f"Proxying {request.method} to {url}")
 
         # Forward the request
+        response = None
         try:
-            async with aiohttp.ClientSession() as session:
-                # Copy headers, excluding proxy-specific ones
-                headers = {
-                    k: v
-                    for k, v in request.headers.items()
-                    if k.lower() not in ("host", "proxy-authorization", "proxy-connection")
-                }
-
-                async with session.request(
-                    request.method,
-                    url,
-                    headers=headers,
-                    data=await request.read(),
-                    allow_redirects=False,
-                ) as resp:
-                    # Forward response
-                    response = web.Response(
-                        status=resp.status,
-                        headers={
-                            k: v
-                            for k, v in resp.headers.items()
-                            if k.lower() not in ("transfer-encoding", "content-encoding")
-                        },
-                        body=await resp.read(),
-                    )
-                    return response
+            session = await self._get_session()
+
+            # Copy headers, excluding hop-by-hop and proxy-specific ones
+            headers = _end_to_end_headers(request.headers, HOP_HEADERS_REQUEST)
+
+            # Stream the request body instead of buffering it
+            data = request.content.iter_chunked(PIPE_CHUNK_SIZE) if request.body_exists else None
+
+            async with session.request(
+                request.method,
+                url,
+                headers=headers,
+                data=data,
+                allow_redirects=False,
+            ) as resp:
+                # Forward response as it arrives; the body is decoded by the
+                # client session, so its original length no longer applies
+                response = web.StreamResponse(
+                    status=resp.status,
+                    headers=_end_to_end_headers(resp.headers, HOP_HEADERS_RESPONSE),
+                )
+                await response.prepare(request)
+                async for chunk in resp.content.iter_chunked(PIPE_CHUNK_SIZE):
+                    await response.write(chunk)
+                await response.write_eof()
+                return response
 
         except Exception as e:
             logger.error(f"Proxy error: {e}")
+            if response is not None and response.prepared:
+                # Headers already sent; abort the connection mid-body
+                raise
             return web.Response(
                 status=502,
                 text=f"Proxy error: {e}",
             )
 
+    @web.middleware
+    async def _connect_middleware(self, request: web.Request, handler) -> web.StreamResponse:
+        """Reject CONNECT on a connection already handed to aiohttp."""
+        if request.method == "CONNECT":
+            response = web.Response(
+                status=400,
+                text="CONNECT must be the first request on a connection",
+            )
+            response.force_close()
+            return response
+        return await handler(request)
+
     def create_app(self) -> web.Application:
         """Create the aiohttp application."""
-        app = web.Application()
+        app = web.Application(middlewares=[self._connect_middleware])
         # Catch all requests
         app.router.add_route("*", "/{path:.*}", self.handle_request)
+        app.on_shutdown.append(self._close_session)
         return app
 
+    async def start(self, host: str, port: int) -> asyncio.Server:
+        """Start listening for proxy connections.
+
+        CONNECT tunnels are handled directly on the socket; any other request
+        is handed to the aiohttp application.
+        """
+        self._runner = web.AppRunner(self.create_app())
+        await self._runner.setup()
+        http_factory = self._runner.server
+
+        loop = asyncio.get_running_loop()
+        self._server = await loop.create_server(
+            lambda: _ProxyFrontProtocol(self, http_factory),
+            host,
+            port,
+        )
+        return self._server
+
+    async def stop(self) -> None:
+        """Stop listening, close client connections and release the aiohttp application.
+
+        Connections are closed before waiting on the server, because since
+        Python 3.12 wait_closed() also waits for every client to disconnect.
+        """
+        if self._server:
+            self._server.close()
+        tunnels = list(self._tunnels)
+        for task in tunnels:
+            task.cancel()
+        await asyncio.gather(*tunnels, return_exceptions=True)
+        for transport in list(self._raw_connections):
+            transport.close()
+        if self._runner:
+            # Closes aiohttp's keep-alive connections and the upstream session
+            await self._runner.cleanup()
+            self._runner = None
+        if self._server:
+            await self._server.wait_closed()
+            self._server = None
+
+
+class _ProxyFrontProtocol(asyncio.Protocol):
+    """Reads the first request head and dispatches it by method.
+
+    CONNECT is handled on the raw transport so tunnels skip HTTP framing
+    entirely; other requests are replayed into an aiohttp request handler,
+    which then owns the connection.
+    """
+
+    def __init__(self, proxy: EgressProxy, http_factory) -> None:
+        self._proxy = proxy
+        self._http_factory = http_factory
+        self._transport: asyncio.Transport | None = None
+        self._buffer = bytearray()
+
+    def connection_made(self, transport: asyncio.Transport) -> None:
+        self._transport = transport
+        self._proxy._raw_connections.add(transport)
+
+    def data_received(self, data: bytes) -> None:
+        self._buffer += data
+        end = self._buffer.find(b"\r\n\r\n")
+        if end == -1:
+            if len(self._buffer) > MAX_REQUEST_HEAD_SIZE:
+                _write_response(self._transport, 431, "Request header too large")
+            return
+
+        if self._buffer.startswith(b"CONNECT "):
+            self._transport.pause_reading()
+            task = asyncio.get_running_loop().create_task(
+                self._proxy.handle_connect(
+                    self._transport,
+                    bytes(self._buffer[:end]),
+                    bytes(self._buffer[end + 4 :]),
+                )
+            )
+            self._proxy._tunnels.add(task)
+            task.add_done_callback(self._proxy._tunnels.discard)
+        else:
+            self._proxy._raw_connections.discard(self._transport)
+            protocol = self._http_factory()
+            self._transport.set_protocol(protocol)
+            protocol.connection_made(self._transport)
+            protocol.data_received(bytes(self._buffer))
+        self._buffer = bytearray()
+
+    def connection_lost(self, exc: Exception | None) -> None:
+        self._proxy._raw_connections.discard(self._transport)
+        self._transport = None
+
 
 def main():
     parser = argparse.ArgumentParser(description="Egress proxy for sandbox containers")
@@ -320,12 +640,26 @@ def main():
     args = parser.parse_args()
 
     proxy = EgressProxy(signing_key=args.signing_key)
-    app = proxy.create_app()
 
     logger.info(f"Egress proxy starting on {args.host}:{args.port}")
     logger.info(f"Default allowed hosts: {DEFAULT_ALLOWED_HOSTS}")
 
-    web.run_app(app, host=args.host, port=args.port, print=None)
+    async def run() -> None:
+        # Stop on SIGTERM as well as Ctrl-C, so tunnels and the upstream
+        # session are closed before exit
+        stop = asyncio.Event()
+        loop = asyncio.get_running_loop()
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            loop.add_signal_handler(sig, stop.set)
+
+        await proxy.start(args.host, args.port)
+        try:
+            await stop.wait()
+        finally:
+            await proxy.stop()
+        logger.info("Egress proxy stopped")
+
+    asyncio.run(run())
 
 
 if __name__ == "__main__":
@@ -9,8 +9,6 @@ import asyncio
 import logging
 import os
 import sys
-import threading
-from concurrent import futures
 from typing import TYPE_CHECKING
 
 import grpc
@@ -23,126 +21,79 @@ from agentbox.sandbox_manager import SandboxManager, SandboxSession
 from agentbox.models import RuntimeType
 
 if TYPE_CHECKING:
-    from grpc import ServicerContext
+    from grpc.aio import ServicerContext
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-
-class AsyncLoopThread:
-    """Manages a dedicated event loop running in a background thread.
-
-    This allows sync gRPC handlers to schedule async work on a shared loop,
-    which is more efficient than creating a new loop per request and ensures
-    background tasks (like session cleanup) keep running.
-    """
-
-    def __init__(self) -> None:
-        self._loop: asyncio.AbstractEventLoop | None = None
-        self._thread: threading.Thread | None = None
-
-    def start(self) -> None:
-        """Start the background event loop thread."""
-        self._loop = asyncio.new_event_loop()
-        self._thread = threading.Thread(target=self._run_loop, daemon=True)
-        self._thread.start()
-
-    def _run_loop(self) -> None:
-        """Run the event loop forever in the background thread."""
-        asyncio.set_event_loop(self._loop)
-        self._loop.run_forever()
-
-    def run(self, coro) -> any:
-        """Run a coroutine on the background loop and wait for result.
-
-        This is thread-safe and can be called from any thread.
-        """
-        if self._loop is None:
-            raise RuntimeError("Event loop not started")
-        future = asyncio.run_coroutine_threadsafe(coro, self._loop)
-        return future.result()
-
-    def stop(self) -> None:
-        """Stop the background event loop."""
-        if self._loop:
-            self._loop.call_soon_threadsafe(self._loop.stop)
-        if self._thread:
-            self._thread.join(timeout=5)
+# SessionInfo templates kept before the oldest is evicted
+SESSION_TEMPLATE_CACHE_SIZE = 4096
 
 
 class SandboxServicer(sandbox_pb2_grpc.SandboxServiceServicer):
     """gRPC servicer implementation."""
 
-    def __init__(self, manager: SandboxManager, loop_thread: AsyncLoopThread) -> None:
+    def __init__(self, manager: SandboxManager) -> None:
         self.manager = manager
-        self._loop = loop_thread
+        # SessionInfo holding each session's immutable fields, by session id
+        self._session_templates: dict[str, sandbox_pb2.SessionInfo] = {}
 
-    def CreateSession(
+    async def CreateSession(
         self, request: sandbox_pb2.CreateSessionRequest, context: ServicerContext
     ) -> sandbox_pb2.CreateSessionResponse:
         """Create a new sandbox session."""
         # Convert repeated field to list, None if empty (use defaults)
         allowed_hosts = list(request.allowed_hosts) if request.allowed_hosts else None
 
-        session = self._loop.run(
-            self.manager.create_session(
-                session_id=request.session_id if request.session_id else None,
-                tenant_id=request.tenant_id if request.tenant_id else None,
-                allowed_hosts=allowed_hosts,
-            )
+        session = await self.manager.create_session(
+            session_id=request.session_id if request.session_id else None,
+            tenant_id=request.tenant_id if request.tenant_id else None,
+            allowed_hosts=allowed_hosts,
         )
         return sandbox_pb2.CreateSessionResponse(
             session=self._session_to_proto(session)
         )
 
-    def DestroySession(
+    async def DestroySession(
         self, request: sandbox_pb2.DestroySessionRequest, context: ServicerContext
     ) -> sandbox_pb2.DestroySessionResponse:
         """Destroy an existing session."""
-        success = self._loop.run(self.manager.destroy_session(request.session_id))
+        success = await self.manager.destroy_session(request.session_id)
+        self._session_templates.pop(request.session_id, None)
         return sandbox_pb2.DestroySessionResponse(success=success)
 
-    def GetSession(
+    async def GetSession(
         self, request: sandbox_pb2.GetSessionRequest, context: ServicerContext
     ) -> sandbox_pb2.GetSessionResponse:
         """Get session info."""
-        session = self._loop.run(self.manager.get_session(request.session_id))
+        session = await self.manager.get_session(request.session_id)
         if not session:
-            context.abort(grpc.StatusCode.NOT_FOUND, "Session not found")
+            await context.abort(grpc.StatusCode.NOT_FOUND, "Session not found")
             return sandbox_pb2.GetSessionResponse()  # Never reached, but satisfies type checker
         return sandbox_pb2.GetSessionResponse(session=self._session_to_proto(session))
 
-    def ListSessions(
+    async def ListSessions(
         self, request: sandbox_pb2.ListSessionsRequest, context: ServicerContext
     ) -> sandbox_pb2.ListSessionsResponse:
         """List all active sessions."""
         sessions = self.manager.list_sessions()
+        # Expired sessions never pass through DestroySession; drop their templates here
+        live = {s["session_id"] for s in sessions}
+        for session_id in self._session_templates.keys() - live:
+            del self._session_templates[session_id]
         return sandbox_pb2.ListSessionsResponse(
-            sessions=[
-                sandbox_pb2.SessionInfo(
-                    session_id=s["session_id"],
-                    container_id=s["container_id"],
-                    created_at=s["created_at"],
-                    last_activity=s["last_activity"],
-                    status=s["status"],
-                    tenant_id=s.get("tenant_id"),
-                    allowed_hosts=s.get("allowed_hosts", []),
-                )
-                for s in sessions
-            ]
+            sessions=[self._session_info(**s) for s in sessions]
         )
 
-    def Exec(
+    async def Exec(
         self, request: sandbox_pb2.ExecRequest, context: ServicerContext
     ) -> sandbox_pb2.ExecResponse:
         """Execute a command and wait for completion."""
-        result = self._loop.run(
-            self.manager.exec_command(
-                session_id=request.session_id,
-                command=request.command,
-                timeout=request.timeout or 30,
-                workdir=request.workdir or "/workspace",
-            )
+        result = await self.manager.exec_command(
+            session_id=request.session_id,
+            command=request.command,
+            timeout=request.timeout or 30,
+            workdir=request.workdir or "/workspace",
         )
         return sandbox_pb2.ExecResponse(
             exit_code=result.exit_code,
@@ -151,23 +102,15 @@ class SandboxServicer(sandbox_pb2_grpc.SandboxServiceServicer):
             timed_out=result.timed_out,
         )
 
-    def ExecStream(
+    async def ExecStream(
         self, request: sandbox_pb2.ExecStreamRequest, context: ServicerContext
     ):
         """Execute a command and stream output."""
-
-        async def collect_chunks():
-            chunks = []
-            async for chunk in self.manager.exec_stream(
-                session_id=request.session_id,
-                command=request.command,
-                workdir=request.workdir or "/workspace",
-            ):
-                chunks.append(chunk)
-            return chunks
-
-        chunks = self._loop.run(collect_chunks())
-        for chunk in chunks:
+        async for chunk in self.manager.exec_stream(
+            session_id=request.session_id,
+            command=request.command,
+            workdir=request.workdir or "/workspace",
+        ):
             exit_code = chunk.get("exit_code") if chunk["type"] == "exit" else None
             yield sandbox_pb2.ExecStreamResponse(
                 type=chunk["type"],
@@ -175,43 +118,37 @@ class SandboxServicer(sandbox_pb2_grpc.SandboxServiceServicer):
                 exit_code=exit_code,
             )
 
-    def WriteFile(
+    async def WriteFile(
         self, request: sandbox_pb2.WriteFileRequest, context: ServicerContext
     ) -> sandbox_pb2.WriteFileResponse:
         """Write a file to the sandbox."""
-        success, error = self._loop.run(
-            self.manager.write_file(
-                session_id=request.session_id,
-                path=request.path,
-                content=request.content,
-                mode=request.mode or "w",
-            )
+        success, error = await self.manager.write_file(
+            session_id=request.session_id,
+            path=request.path,
+            content=request.content,
+            mode=request.mode or "w",
         )
         return sandbox_pb2.WriteFileResponse(success=success, error=error)
 
-    def ReadFile(
+    async def ReadFile(
         self, request: sandbox_pb2.ReadFileRequest, context: ServicerContext
     ) -> sandbox_pb2.ReadFileResponse:
         """Read a file from the sandbox."""
-        success, content = self._loop.run(
-            self.manager.read_file(
-                session_id=request.session_id,
-                path=request.path,
-            )
+        success, content = await self.manager.read_file(
+            session_id=request.session_id,
+            path=request.path,
         )
         if success:
             return sandbox_pb2.ReadFileResponse(success=True, content=content)
         return sandbox_pb2.ReadFileResponse(success=False, error=content)
 
-    def PipInstall(
+    async def PipInstall(
         self, request: sandbox_pb2.PipInstallRequest, context: ServicerContext
     ) -> sandbox_pb2.ExecResponse:
         """Install Python packages."""
-        result = self._loop.run(
-            self.manager.pip_install(
-                session_id=request.session_id,
-                packages=list(request.packages),
-            )
+        result = await self.manager.pip_install(
+            session_id=request.session_id,
+            packages=list(request.packages),
         )
         return sandbox_pb2.ExecResponse(
             exit_code=result.exit_code,
@@ -222,7 +159,7 @@ class SandboxServicer(sandbox_pb2_grpc.SandboxServiceServicer):
 
     def _session_to_proto(self, session: SandboxSession) -> sandbox_pb2.SessionInfo:
         """Convert SandboxSession to protobuf SessionInfo."""
-        return sandbox_pb2.SessionInfo(
+        return self._session_info(
             session_id=session.session_id,
             container_id=session.container.short_id,
             created_at=session.created_at,
@@ -232,8 +169,43 @@ class SandboxServicer(sandbox_pb2_grpc.SandboxServiceServicer):
             allowed_hosts=session.allowed_hosts,
         )
 
+    def _session_info(
+        self,
+        session_id: str,
+        container_id: str,
+        created_at: float,
+        last_activity: float,
+        status: str,
+        tenant_id: str | None,
+        allowed_hosts: list[str],
+    ) -> sandbox_pb2.SessionInfo:
+        """Build a SessionInfo from a session's fields (as in list_sessions()).
+
+        The immutable fields are built once per session and copied into each
+        response; only last_activity and status are set per call. A template
+        is rebuilt if its session id now belongs to a different container.
+        """
+        template = self._session_templates.get(session_id)
+        if template is None or template.container_id != container_id:
+            template = sandbox_pb2.SessionInfo(
+                session_id=session_id,
+                container_id=container_id,
+                created_at=created_at,
+                tenant_id=tenant_id,
+                allowed_hosts=allowed_hosts,
+            )
+            if len(self._session_templates) >= SESSION_TEMPLATE_CACHE_SIZE:
+                del self._session_templates[next(iter(self._session_templates))]
+            self._session_templates[session_id] = template
+
+        info = sandbox_pb2.SessionInfo()
+        info.MergeFrom(template)
+        info.last_activity = last_activity
+        info.status = status
+        return info
+
 
-def serve(port: int = 50051) -> None:
+async def serve(port: int = 50051) -> None:
     """Start the gRPC server."""
     # Initialize sandbox manager
     runtime_str = os.getenv("SANDBOX_RUNTIME", "runc")
@@ -251,34 +223,41 @@ def serve(port: int = 50051) -> None:
         proxy_host=proxy_host,
         proxy_port=proxy_port,
         signing_key=signing_key,
+        warm_pool_size=int(os.getenv("WARM_POOL_SIZE", "0")),
+        docker_workers=int(os.getenv("DOCKER_WORKERS", "64")),
     )
 
-    # Start background event loop for async operations
-    loop_thread = AsyncLoopThread()
-    loop_thread.start()
-
-    # Start the manager's cleanup task on the background loop
-    loop_thread.run(manager.start())
+    # Handlers and the manager's cleanup task share the server's event loop
+    await manager.start()
 
     # Create gRPC server
-    server = grpc.server(futures.ThreadPoolExecutor(max_workers=10))
-    sandbox_pb2_grpc.add_SandboxServiceServicer_to_server(
-        SandboxServicer(manager, loop_thread), server
+    # Raise the default 4 MB message cap so large ReadFile/WriteFile payloads fit
+    max_message_bytes = int(os.getenv("GRPC_MAX_MESSAGE_MB", "64")) * 1024 * 1024
+    server = grpc.aio.server(
+        options=[
+            ("grpc.max_receive_message_length", max_message_bytes),
+            ("grpc.max_send_message_length", max_message_bytes),
+            ("grpc.keepalive_time_ms", 30000),
+        ],
+        maximum_concurrent_rpcs=int(os.getenv("GRPC_MAX_CONCURRENT_RPCS", "256")),
     )
+    sandbox_pb2_grpc.add_SandboxServiceServicer_to_server(SandboxServicer(manager), server)
 
     server.add_insecure_port(f"[::]:{port}")
-    server.start()
+    await server.start()
     logger.info(f"gRPC server started on port {port}")
 
     try:
-        server.wait_for_termination()
-    except KeyboardInterrupt:
+        await server.wait_for_termination()
+    finally:
         logger.info("Shutting down...")
-        loop_thread.run(manager.stop())
-        loop_thread.stop()
-        server.stop(grace=5)
+        await server.stop(grace=5)
+        await manager.stop()
 
 
 if __name__ == "__main__":
     port = int(os.getenv("GRPC_PORT", "50051"))
-    serve(port)
+    try:
+        asyncio.run(serve(port))
+    except KeyboardInterrupt:
+        pass
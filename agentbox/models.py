@@ -4,7 +4,7 @@ from dataclasses import dataclass
 from enum import Enum
 
 
-@dataclass
+@dataclass(slots=True, frozen=True)
 class ExecResponse:
     """Response from command execution."""
     exit_code: int
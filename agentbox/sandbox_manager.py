@@ -1,20 +1,26 @@
 import asyncio
 import base64
+import contextlib
+import gzip
 import hashlib
+import heapq
 import hmac
-import json
 import logging
 import re
 import secrets
+import shlex
+import string
 import time
 import uuid
-from datetime import datetime, timedelta, timezone
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 from typing import AsyncIterator, Optional
+from urllib.parse import quote
 from dataclasses import dataclass, field
 
 import docker
 import httpx
+import orjson
 from docker.models.containers import Container
 from docker.errors import NotFound, APIError
 
@@ -33,9 +39,22 @@ DEFAULT_ALLOWED_HOSTS = [
     "crates.io",
     "static.crates.io",
 ]
+DEFAULT_ALLOWED_HOSTS_SET = frozenset(DEFAULT_ALLOWED_HOSTS)
+# Precomputed allowed_hosts claim for proxy JWTs using the default hosts
+DEFAULT_ALLOWED_HOSTS_JOINED = ",".join(DEFAULT_ALLOWED_HOSTS)
 
+# Hosts pip needs for installs through the egress proxy
+PYPI_HOSTS = frozenset({"pypi.org", "files.pythonhosted.org"})
 
-@dataclass
+# Request headers for orjson-encoded process_api bodies
+JSON_HEADERS = {"Content-Type": "application/json"}
+# write_file bodies larger than this are gzip-compressed (bytes)
+WRITE_COMPRESS_THRESHOLD = 4096
+# Worker threads for blocking docker-py calls; the daemon connection pool matches it
+DOCKER_POOL_SIZE = 64
+
+
+@dataclass(slots=True)
 class SandboxSession:
     """Represents an active sandbox session."""
 
@@ -47,6 +66,14 @@ class SandboxSession:
     tenant_id: Optional[str] = None
     allowed_hosts: list[str] = field(default_factory=list)
     last_activity: float = field(default_factory=time.time)
+    # allowed_hosts as a set for membership checks
+    allowed_hosts_set: frozenset[str] = field(init=False, repr=False, compare=False)
+
+    def __post_init__(self) -> None:
+        if self.allowed_hosts is DEFAULT_ALLOWED_HOSTS:
+            self.allowed_hosts_set = DEFAULT_ALLOWED_HOSTS_SET
+        else:
+            self.allowed_hosts_set = frozenset(self.allowed_hosts)
 
     @property
     def api_url(self) -> str:
@@ -74,16 +101,23 @@ class SandboxManager:
         proxy_host: Optional[str] = None,
         proxy_port: int = 15004,
         signing_key: Optional[str] = None,
+        warm_pool_size: int = 0,
+        docker_workers: int = DOCKER_POOL_SIZE,
     ):
         self.image_name = image_name
         self.runtime = runtime
         self.session_timeout = session_timeout
         self.cleanup_interval = cleanup_interval
+        self.warm_pool_size = warm_pool_size
 
         # Egress proxy configuration
         self.proxy_host = proxy_host
         self.proxy_port = proxy_port
         self.signing_key = signing_key or secrets.token_hex(32)
+        # Keyed HMAC prototype; copies skip re-deriving the inner/outer pads per token.
+        # The prototype itself is never updated, so copying it is thread-safe.
+        self._signing_key_bytes = self.signing_key.encode()
+        self._hmac_proto = hmac.new(self._signing_key_bytes, b"", hashlib.sha256)
 
         # Persistent storage directory
         self.storage_path = Path(storage_path) if storage_path else None
@@ -91,27 +125,72 @@ class SandboxManager:
             self.storage_path.mkdir(parents=True, exist_ok=True)
             logger.info(f"Persistent storage enabled at: {self.storage_path}")
 
-        self.docker_client = docker.from_env()
+        # One keep-alive daemon connection per worker thread, so container ops
+        # reuse sockets instead of reconnecting when the pool is exhausted
+        self.docker_client = docker.from_env(max_pool_size=docker_workers)
+        self._docker_executor = ThreadPoolExecutor(
+            max_workers=docker_workers, thread_name_prefix="docker-io"
+        )
         self.sessions: dict[str, SandboxSession] = {}
+        # (deadline, session_id) min-heap; entries go stale when a session is
+        # touched or destroyed and are re-checked lazily on cleanup
+        self._expiry_heap: list[tuple[float, str]] = []
         self._cleanup_task: Optional[asyncio.Task] = None
-        self._lock = asyncio.Lock()
+        # Per-session-id [lock, holders] so creates for different ids run concurrently
+        self._session_locks: dict[str, list] = {}
+        self._shutting_down = False
+        # In-flight create_session calls, awaited by stop() before it shuts down
+        self._creating: set[asyncio.Task] = set()
+        # In-flight container removals, shared by concurrent destroy_session calls
+        self._destroying: dict[str, asyncio.Task] = {}
         self._http_client: Optional[httpx.AsyncClient] = None
+        self._http_client_loop: Optional[asyncio.AbstractEventLoop] = None
+        # Pre-started generic containers as (container, api_host, api_port). Only
+        # sessions without tenant mounts or proxy credentials can take one.
+        self._warm_pool: asyncio.Queue[tuple[Container, str, int]] = asyncio.Queue()
+        self._pool_refill_task: Optional[asyncio.Task] = None
 
     async def _get_http_client(self) -> httpx.AsyncClient:
-        """Get or create a shared httpx client for connection reuse."""
-        if self._http_client is None or self._http_client.is_closed:
-            self._http_client = httpx.AsyncClient(timeout=httpx.Timeout(300.0))
+        """Get or create a shared httpx client for connection reuse.
+
+        The client's pooled connections belong to the loop that created it, so
+        a new client is created if called from a different event loop.
+        """
+        loop = asyncio.get_running_loop()
+        if (
+            self._http_client is None
+            or self._http_client.is_closed
+            or self._http_client_loop is not loop
+        ):
+            self._http_client = httpx.AsyncClient(
+                timeout=httpx.Timeout(300.0),
+                limits=httpx.Limits(
+                    max_keepalive_connections=200,
+                    max_connections=500,
+                    keepalive_expiry=60.0,
+                ),
+            )
+            self._http_client_loop = loop
         return self._http_client
 
+    async def _run_docker(self, func, *args, **kwargs):
+        """Run a blocking docker-py call on the manager's dedicated executor."""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(
+            self._docker_executor, lambda: func(*args, **kwargs)
+        )
+
     async def start(self):
         """Start the manager and cleanup task."""
         self._cleanup_task = asyncio.create_task(self._cleanup_loop())
+        self._schedule_pool_refill()
         logger.info("SandboxManager started")
         if self.proxy_host:
             logger.info(f"Egress proxy configured at {self.proxy_host}:{self.proxy_port}")
 
     async def stop(self) -> None:
         """Stop the manager and cleanup all sessions."""
+        self._shutting_down = True
         if self._cleanup_task:
             self._cleanup_task.cancel()
             try:
@@ -119,49 +198,72 @@ class SandboxManager:
             except asyncio.CancelledError:
                 pass
 
-        # Cleanup all active sessions
+        if self._pool_refill_task:
+            self._pool_refill_task.cancel()
+            try:
+                await self._pool_refill_task
+            except asyncio.CancelledError:
+                pass
+
+        # No new creates are admitted; let those already running finish (or
+        # remove their own container) before sessions are torn down
+        await asyncio.gather(*self._creating, return_exceptions=True)
+
+        # Remove unused warm containers and all active sessions in parallel
+        removals = []
+        while not self._warm_pool.empty():
+            container, _, _ = self._warm_pool.get_nowait()
+            removals.append(self._run_docker(container.remove, force=True))
         for session_id in list(self.sessions.keys()):
-            await self.destroy_session(session_id)
+            self._begin_destroy(session_id)
+        removals.extend(self._destroying.values())
+        for result in await asyncio.gather(*removals, return_exceptions=True):
+            if isinstance(result, Exception):
+                logger.warning(f"Failed to remove container during shutdown: {result}")
 
         # Close HTTP client
         if self._http_client and not self._http_client.is_closed:
             await self._http_client.aclose()
             self._http_client = None
 
+        self._docker_executor.shutdown(wait=False)
+
         logger.info("SandboxManager stopped")
 
+    # The JWT header never changes, so it is encoded once
+    _JWT_HEADER_B64 = (
+        base64.urlsafe_b64encode(b'{"typ":"JWT","alg":"HS256"}').rstrip(b"=").decode()
+    )
+
     def _generate_proxy_jwt(
         self,
         session_id: str,
         tenant_id: Optional[str],
         allowed_hosts: list[str],
     ) -> str:
-        """Generate a JWT for the egress proxy."""
-        header = {"typ": "JWT", "alg": "HS256"}
+        """Generate a JWT for the egress proxy.
+
+        Not cached: every session id is new, so each token is signed once.
+        """
         payload = {
             "iss": "sandbox-egress-control",
             "session_id": session_id,
             "tenant_id": tenant_id,
-            "allowed_hosts": ",".join(allowed_hosts),
-            "exp": int((datetime.now(timezone.utc) + timedelta(hours=4)).timestamp()),
+            "allowed_hosts": (
+                DEFAULT_ALLOWED_HOSTS_JOINED
+                if allowed_hosts is DEFAULT_ALLOWED_HOSTS
+                else ",".join(allowed_hosts)
+            ),
+            "exp": int(time.time()) + 4 * 3600,  # 4 hours
         }
 
-        def b64encode(data: dict) -> str:
-            return base64.urlsafe_b64encode(
-                json.dumps(data, separators=(",", ":")).encode()
-            ).rstrip(b"=").decode()
-
-        header_b64 = b64encode(header)
-        payload_b64 = b64encode(payload)
-        message = f"{header_b64}.{payload_b64}"
+        payload_b64 = base64.urlsafe_b64encode(orjson.dumps(payload)).rstrip(b"=").decode()
+        message = f"{self._JWT_HEADER_B64}.{payload_b64}"
 
-        signature = hmac.new(
-            self.signing_key.encode(),
-            message.encode(),
-            hashlib.sha256,
-        ).digest()
+        mac = self._hmac_proto.copy()
+        mac.update(message.encode())
+        signature = mac.digest()
         signature_b64 = base64.urlsafe_b64encode(signature).rstrip(b"=").decode()
-
         return f"{message}.{signature_b64}"
 
     def _generate_proxy_url(
@@ -191,15 +293,36 @@ class SandboxManager:
             allowed_hosts: List of allowed egress hosts. Defaults to package
                           registries and GitHub. Pass empty list to disable network.
         """
-        async with self._lock:
-            if session_id is None:
-                session_id = str(uuid.uuid4())
+        if self._shutting_down:
+            raise RuntimeError("SandboxManager is shutting down")
+
+        if session_id is None:
+            session_id = str(uuid.uuid4())
+
+        task = asyncio.ensure_future(self._create_session(session_id, tenant_id, allowed_hosts))
+        self._creating.add(task)
+        task.add_done_callback(self._creating.discard)
+        return await task
 
+    async def _create_session(
+        self,
+        session_id: str,
+        tenant_id: Optional[str],
+        allowed_hosts: Optional[list[str]],
+    ) -> SandboxSession:
+        """Body of create_session, run as a task that stop() can wait for."""
+        async with self._session_lock(session_id):
             if session_id in self.sessions:
                 session = self.sessions[session_id]
                 session.last_activity = time.time()
                 return session
 
+            # A destroy of this id may still be removing the old container,
+            # whose name the new one would collide with
+            removal = self._destroying.get(session_id)
+            if removal is not None:
+                await asyncio.shield(removal)
+
             # Use default hosts if not specified
             hosts = allowed_hosts if allowed_hosts is not None else DEFAULT_ALLOWED_HOSTS
 
@@ -208,19 +331,40 @@ class SandboxManager:
             if tenant_id and self.storage_path:
                 tenant_storage = self._ensure_tenant_storage(tenant_id)
 
-            # Create container
-            container = await asyncio.get_event_loop().run_in_executor(
-                None,
-                lambda: self._create_container(
-                    session_id, tenant_id, tenant_storage, hosts
-                ),
-            )
+            warm = None
+            if tenant_storage is None and bool(hosts) == self._pool_networked:
+                warm = self._take_warm_container()
+
+            if warm:
+                container, api_host, api_port = warm
+                try:
+                    await self._run_docker(container.rename, f"sandbox-{session_id[:8]}")
+                except Exception:
+                    # The container has left the pool; don't leave it running
+                    try:
+                        await self._run_docker(container.remove, force=True)
+                    except (NotFound, APIError):
+                        pass
+                    raise
+            else:
+                # Create container
+                container = await self._run_docker(
+                    self._create_container, session_id, tenant_id, tenant_storage, hosts
+                )
 
-            # Get address for process_api communication
-            api_host, api_port = await self._get_container_api_address(container)
+                # Get address for process_api communication
+                api_host, api_port = await self._get_container_api_address(container)
 
-            # Wait for process_api to be ready
-            await self._wait_for_process_api(api_host, api_port)
+                # Wait for process_api to be ready
+                await self._wait_for_process_api(api_host, api_port)
+
+            if self._shutting_down:
+                # stop() won't see this session; remove the container here
+                try:
+                    await self._run_docker(container.remove, force=True)
+                except (NotFound, APIError):
+                    pass
+                raise RuntimeError("SandboxManager is shutting down")
 
             session = SandboxSession(
                 session_id=session_id,
@@ -232,6 +376,9 @@ class SandboxManager:
                 allowed_hosts=hosts,
             )
             self.sessions[session_id] = session
+            heapq.heappush(
+                self._expiry_heap, (session.last_activity + self.session_timeout, session_id)
+            )
 
             network_info = f"allowed_hosts={hosts}" if hosts else "network disabled"
             logger.info(
@@ -241,6 +388,74 @@ class SandboxManager:
             )
             return session
 
+    @contextlib.asynccontextmanager
+    async def _session_lock(self, session_id: str) -> AsyncIterator[None]:
+        """Hold the lock for one session id, dropping it once unused."""
+        entry = self._session_locks.get(session_id)
+        if entry is None:
+            entry = self._session_locks[session_id] = [asyncio.Lock(), 0]
+        entry[1] += 1
+        try:
+            async with entry[0]:
+                yield
+        finally:
+            entry[1] -= 1
+            if entry[1] == 0:
+                del self._session_locks[session_id]
+
+    @property
+    def _pool_networked(self) -> bool:
+        """Whether warm containers get bridge networking.
+
+        With a proxy, networked containers carry a per-session JWT, so only
+        network-disabled containers can be prepared ahead of time.
+        """
+        return not self.proxy_host
+
+    def _take_warm_container(self) -> Optional[tuple[Container, str, int]]:
+        """Pop a ready container from the warm pool and schedule a refill."""
+        try:
+            warm = self._warm_pool.get_nowait()
+        except asyncio.QueueEmpty:
+            return None
+        self._schedule_pool_refill()
+        return warm
+
+    def _schedule_pool_refill(self) -> None:
+        """Start the warm pool refill task unless one is already running."""
+        if self.warm_pool_size <= 0 or self._shutting_down:
+            return
+        if self._pool_refill_task is None or self._pool_refill_task.done():
+            self._pool_refill_task = asyncio.create_task(self._refill_pool())
+
+    async def _refill_pool(self) -> None:
+        """Start generic containers until the warm pool is full.
+
+        Labels can't be changed once a container exists, so a pooled
+        container's session-id label keeps its pool id after a session
+        takes it. Its name, sandbox-{session_id[:8]}, is what identifies the
+        session.
+        """
+        hosts = DEFAULT_ALLOWED_HOSTS if self._pool_networked else []
+        while self._warm_pool.qsize() < self.warm_pool_size:
+            pool_id = str(uuid.uuid4())
+            container = None
+            try:
+                container = await self._run_docker(
+                    self._create_container, pool_id, None, None, hosts
+                )
+                api_host, api_port = await self._get_container_api_address(container)
+                await self._wait_for_process_api(api_host, api_port)
+            except Exception as e:
+                logger.error(f"Failed to start warm container: {e}")
+                if container is not None:
+                    try:
+                        await self._run_docker(container.remove, force=True)
+                    except (NotFound, APIError):
+                        pass
+                return
+            self._warm_pool.put_nowait((container, api_host, api_port))
+
     def _ensure_tenant_storage(self, tenant_id: str) -> Path:
         """Create and return the storage directory for a tenant."""
         tenant_dir = self.storage_path / tenant_id
@@ -322,39 +537,44 @@ class SandboxManager:
     async def _get_container_api_address(self, container: Container) -> tuple[str, int]:
         """Get the host and port to connect to the container's process_api."""
         def get_address():
-            container.reload()
+            # One inspect call; refreshing attrs keeps container.status current
+            # without building a throwaway Container as reload() does
+            container.attrs = self.docker_client.api.inspect_container(container.id)
+            network_settings = container.attrs["NetworkSettings"]
             # Get the mapped port for 2024/tcp
-            ports = container.attrs["NetworkSettings"]["Ports"]
-            port_mapping = ports.get("2024/tcp")
+            port_mapping = network_settings["Ports"].get("2024/tcp")
             if port_mapping:
                 # Use localhost with the mapped port
                 host_port = int(port_mapping[0]["HostPort"])
                 return ("127.0.0.1", host_port)
             # Fallback to container IP if no port mapping
-            networks = container.attrs["NetworkSettings"]["Networks"]
+            networks = network_settings["Networks"]
             for network in networks.values():
                 if network.get("IPAddress"):
                     return (network["IPAddress"], 2024)
             raise RuntimeError("Container has no accessible address")
 
-        return await asyncio.get_event_loop().run_in_executor(None, get_address)
+        return await self._run_docker(get_address)
 
     async def _wait_for_process_api(
         self, api_host: str, api_port: int, timeout: float = 30.0
     ) -> None:
         """Wait for the process_api to be ready."""
         url = f"http://{api_host}:{api_port}/health"
-        start = time.time()
+        start = time.monotonic()
         client = await self._get_http_client()
+        # Back off from 5 ms to 100 ms so a fast-starting API isn't left idle
+        delay = 0.005
 
-        while time.time() - start < timeout:
+        while time.monotonic() - start < timeout:
             try:
                 response = await client.get(url, timeout=1.0)
                 if response.status_code == 200:
                     return
             except (httpx.ConnectError, httpx.ReadTimeout, httpx.RemoteProtocolError):
                 pass
-            await asyncio.sleep(0.1)
+            await asyncio.sleep(delay)
+            delay = min(0.1, delay * 2)
 
         raise RuntimeError(f"process_api did not become ready within {timeout}s")
 
@@ -366,25 +586,49 @@ class SandboxManager:
         return session
 
     async def destroy_session(self, session_id: str) -> bool:
-        """Destroy a session and its container."""
-        async with self._lock:
-            session = self.sessions.pop(session_id, None)
-            if not session:
-                return False
+        """Destroy a session and its container.
 
-            try:
-                await asyncio.get_event_loop().run_in_executor(
-                    None,
-                    lambda: session.container.remove(force=True),
-                )
-                logger.info(f"Destroyed session {session_id}")
-                return True
-            except NotFound:
-                logger.warning(f"Container for session {session_id} already gone")
-                return True
-            except APIError as e:
-                logger.error(f"Failed to destroy session {session_id}: {e}")
-                return False
+        Concurrent calls for the same session share a single removal, and a
+        create_session for the same id waits for it to finish.
+        """
+        async with self._session_lock(session_id):
+            task = self._begin_destroy(session_id)
+        if task is None:
+            return False
+        return await asyncio.shield(task)
+
+    def _begin_destroy(self, session_id: str) -> Optional[asyncio.Task]:
+        """Detach a session and start removing its container.
+
+        Returns the in-flight removal if one already exists, or None if
+        the session is unknown.
+        """
+        task = self._destroying.get(session_id)
+        if task is not None:
+            return task
+
+        session = self.sessions.pop(session_id, None)
+        if not session:
+            return None
+
+        task = asyncio.create_task(self._remove_session_container(session))
+        self._destroying[session_id] = task
+        task.add_done_callback(lambda _: self._destroying.pop(session_id, None))
+        return task
+
+    async def _remove_session_container(self, session: SandboxSession) -> bool:
+        """Force-remove a detached session's container."""
+        session_id = session.session_id
+        try:
+            await self._run_docker(session.container.remove, force=True)
+            logger.info(f"Destroyed session {session_id}")
+            return True
+        except NotFound:
+            logger.warning(f"Container for session {session_id} already gone")
+            return True
+        except APIError as e:
+            logger.error(f"Failed to destroy session {session_id}: {e}")
+            return False
 
     async def exec_command(
         self,
@@ -407,15 +651,18 @@ class SandboxManager:
             client = await self._get_http_client()
             response = await client.post(
                 f"{session.api_url}/exec",
-                json={
-                    "command": command,
-                    "workdir": workdir,
-                    "timeout": timeout,
-                },
+                content=orjson.dumps(
+                    {
+                        "command": command,
+                        "workdir": workdir,
+                        "timeout": timeout,
+                    }
+                ),
+                headers=JSON_HEADERS,
                 timeout=timeout + 5,
             )
 
-            data = response.json()
+            data = orjson.loads(response.content)
             return ExecResponse(
                 exit_code=data.get("exit_code", -1),
                 stdout=data.get("stdout", ""),
@@ -455,15 +702,26 @@ class SandboxManager:
             async with client.stream(
                 "POST",
                 f"{session.api_url}/exec/stream",
-                json={
-                    "command": command,
-                    "workdir": workdir,
-                },
+                content=orjson.dumps(
+                    {
+                        "command": command,
+                        "workdir": workdir,
+                    }
+                ),
+                headers=JSON_HEADERS,
             ) as response:
-                async for line in response.aiter_lines():
-                    if line.startswith("data: "):
-                        data = json.loads(line[6:])
-                        yield data
+                # Split SSE lines on bytes; orjson parses the UTF-8 payload as is
+                buf = bytearray()
+                async for chunk in response.aiter_bytes():
+                    buf += chunk
+                    start = 0
+                    while (nl := buf.find(b"\n", start)) != -1:
+                        if buf.startswith(b"data: ", start):
+                            yield orjson.loads(buf[start + 6 : nl])
+                        start = nl + 1
+                    del buf[:start]
+                if buf.startswith(b"data: "):
+                    yield orjson.loads(buf[6:])
 
         except Exception as e:
             logger.error(f"Streaming exec error: {e}")
@@ -475,24 +733,34 @@ class SandboxManager:
         path: str,
         content: str,
         mode: str = "w",
+        compress: bool = True,
     ) -> tuple[bool, Optional[str]]:
-        """Write a file in the sandbox via process_api."""
+        """Write a file in the sandbox via process_api.
+
+        Bodies over WRITE_COMPRESS_THRESHOLD are gzip-compressed at level 1
+        unless compress is False; aiohttp decompresses them on arrival.
+        """
         session = await self.get_session(session_id)
         if not session:
             return False, "Session not found"
 
         try:
             client = await self._get_http_client()
+            body = content.encode() if isinstance(content, str) else content
+            # Raw body avoids JSON-escaping the file content
+            headers = {
+                "Content-Type": "application/octet-stream",
+                "X-Path": quote(path),
+                "X-Mode": mode,
+            }
+            if compress and len(body) > WRITE_COMPRESS_THRESHOLD:
+                body = gzip.compress(body, compresslevel=1)
+                headers["Content-Encoding"] = "gzip"
             response = await client.post(
-                f"{session.api_url}/file/write",
-                json={
-                    "path": path,
-                    "content": content,
-                    "mode": mode,
-                },
+                f"{session.api_url}/file/write", content=body, headers=headers
             )
 
-            data = response.json()
+            data = orjson.loads(response.content)
             if data.get("success"):
                 return True, None
             return False, data.get("error", "Unknown error")
@@ -508,15 +776,21 @@ class SandboxManager:
 
         try:
             client = await self._get_http_client()
-            response = await client.post(
-                f"{session.api_url}/file/read",
-                json={"path": path},
+            # Mid-sized files come back gzipped (httpx decodes them); the rest
+            # are sent with sendfile()
+            response = await client.get(
+                f"{session.api_url}/file/raw",
+                params={"path": path},
+                headers={"Accept-Encoding": "gzip"},
             )
 
-            data = response.json()
-            if data.get("success"):
-                return True, data.get("content", "")
-            return False, data.get("error", "Unknown error")
+            if response.status_code != 200:
+                return False, orjson.loads(response.content).get("error", "Unknown error")
+            content = response.content.decode("utf-8")
+            # Match text-mode reads, which translate \r\n and \r to \n
+            if "\r" in content:
+                content = content.replace("\r\n", "\n").replace("\r", "\n")
+            return True, content
 
         except Exception as e:
             return False, str(e)
@@ -531,6 +805,16 @@ class SandboxManager:
         r"(?:[<>=!~]+[A-Za-z0-9.*,<>=!~]+)?"  # Optional version specifier
         r"$"
     )
+    # Characters of a bare package name; names made only of these skip the regex
+    _PIP_NAME_CHARS = frozenset(string.ascii_letters + string.digits + "._-")
+
+    @classmethod
+    def _is_valid_pip_package(cls, pkg: str) -> bool:
+        """Check a package specifier, taking a fast path for bare names."""
+        if pkg[:1].isascii() and pkg[:1].isalnum() and cls._PIP_NAME_CHARS.issuperset(pkg):
+            return True
+        # fullmatch: "$" alone would also accept a trailing newline
+        return cls._PIP_PACKAGE_PATTERN.fullmatch(pkg) is not None
 
     async def pip_install(
         self,
@@ -552,8 +836,7 @@ class SandboxManager:
             )
 
         # Check if pypi is allowed
-        pypi_hosts = ["pypi.org", "files.pythonhosted.org"]
-        if not all(h in session.allowed_hosts for h in pypi_hosts):
+        if not PYPI_HOSTS <= session.allowed_hosts_set:
             return ExecResponse(
                 exit_code=-1,
                 stdout="",
@@ -562,21 +845,19 @@ class SandboxManager:
             )
 
         # Validate package names against PEP 508 pattern
-        sanitized = []
-        for pkg in packages:
-            if not self._PIP_PACKAGE_PATTERN.match(pkg):
-                return ExecResponse(
-                    exit_code=-1,
-                    stdout="",
-                    stderr=f"Invalid package specifier: {pkg}",
-                    timed_out=False,
-                )
-            sanitized.append(pkg)
+        is_valid = self._is_valid_pip_package
+        invalid = next((pkg for pkg in packages if not is_valid(pkg)), None)
+        if invalid is not None:
+            return ExecResponse(
+                exit_code=-1,
+                stdout="",
+                stderr=f"Invalid package specifier: {invalid}",
+                timed_out=False,
+            )
 
-        packages_str = " ".join(f"'{p}'" for p in sanitized)
-        command = f"pip install --user {packages_str}"
+        command = shlex.join(["pip", "install", "--user", *packages])
 
-        logger.info(f"Installing packages in session {session_id}: {sanitized}")
+        logger.info(f"Installing packages in session {session_id}: {packages}")
         return await self.exec_command(session_id, command, timeout=timeout)
 
     async def _cleanup_loop(self):
@@ -591,13 +872,24 @@ class SandboxManager:
                 logger.error(f"Cleanup error: {e}")
 
     async def _cleanup_expired(self):
-        """Remove sessions that have been inactive too long."""
+        """Remove sessions that have been inactive too long.
+
+        Only heap entries whose deadline has passed are examined; a session
+        touched since its entry was pushed is re-queued at its new deadline.
+        """
         now = time.time()
-        expired = [
-            sid
-            for sid, session in self.sessions.items()
-            if now - session.last_activity > self.session_timeout
-        ]
+        heap = self._expiry_heap
+        expired = []
+        while heap and heap[0][0] < now:
+            _, sid = heapq.heappop(heap)
+            session = self.sessions.get(sid)
+            if session is None:
+                continue
+            deadline = session.last_activity + self.session_timeout
+            if deadline < now:
+                expired.append(sid)
+            else:
+                heapq.heappush(heap, (deadline, sid))
 
         for session_id in expired:
             logger.info(f"Cleaning up expired session {session_id}")
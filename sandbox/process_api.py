@@ -9,6 +9,9 @@ Endpoints:
     POST /exec          - Execute command, return JSON result
     POST /exec/stream   - Execute command, stream output via SSE
     GET  /health        - Health check
+    POST /file/write    - Write a file (raw body + X-Path header, or JSON)
+    POST /file/read     - Read a file, return JSON
+    GET  /file/raw      - Read a file, return its bytes (?path=...)
 
 Usage:
     ./process_api --addr 0.0.0.0:2024 --memory-limit-bytes 4294967296
@@ -16,25 +19,635 @@ Usage:
 
 import argparse
 import asyncio
-import json
+import codecs
+import ctypes
+import fcntl
+import functools
+import gzip
 import logging
 import os
+import re
 import resource
+import secrets
+import shlex
 import signal
+import stat
 import sys
-from asyncio.subprocess import PIPE
+from asyncio.subprocess import DEVNULL, PIPE
 from http import HTTPStatus
+from urllib.parse import unquote
 
+import orjson
 from aiohttp import web
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 
+# Resolved paths must fall under one of these directories
+WRITE_PREFIXES = ("/workspace/", "/mnt/user-data/outputs/")
+READ_PREFIXES = ("/workspace/", "/mnt/user-data/")
+
+
+def resolve_path(path: str) -> tuple[str, bool]:
+    """os.path.realpath of a path, and whether its parent directory exists.
+
+    Resolved afresh on every call: any directory on the way can be renamed or
+    swapped for a symlink between requests.
+    """
+    resolved = os.path.realpath(path)
+    return resolved, os.path.isdir(os.path.dirname(resolved))
+
+
+# /file/raw gzips files in this size range for clients that accept it
+GZIP_MIN_SIZE = 4096
+GZIP_MAX_SIZE = 8 * 1024 * 1024
+
+
+@functools.lru_cache(maxsize=16)
+def _gzip_file(path: str, dev: int, ino: int, size: int, mtime_ns: int, ctime_ns: int) -> bytes:
+    """A file's contents gzipped at level 1, memoized on its identity and version.
+
+    Any write bumps ctime and replacing the file changes its inode, so a stale
+    entry is never returned.
+    """
+    with open(path, "rb") as f:
+        return gzip.compress(f.read(), compresslevel=1, mtime=0)
+
+
+def _write_all(fd: int, data: bytes) -> None:
+    """os.write until every byte is written."""
+    view = memoryview(data)
+    while view:
+        view = view[os.write(fd, view):]
+
+
+def _truncate_write(path: str, data: bytes) -> None:
+    """Overwrite a file in place, creating it if needed."""
+    fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o666)
+    try:
+        _write_all(fd, data)
+    finally:
+        os.close(fd)
+
+
+def _link_over(fd: int, path: str) -> None:
+    """Link an O_TMPFILE inode in and rename it over path."""
+    dirpath, name = os.path.split(path)
+    dir_fd = os.open(dirpath, os.O_RDONLY | os.O_DIRECTORY)
+    try:
+        # linkat can't overwrite, so link under a unique name and rename.
+        # A dir_fd makes os.link use linkat with AT_SYMLINK_FOLLOW, which
+        # the /proc/self/fd magic link needs.
+        tmp_name = f".{name}.{secrets.token_hex(8)}.tmp"
+        os.link(f"/proc/self/fd/{fd}", tmp_name, dst_dir_fd=dir_fd)
+        try:
+            os.replace(tmp_name, name, src_dir_fd=dir_fd, dst_dir_fd=dir_fd)
+        except OSError:
+            os.unlink(tmp_name, dir_fd=dir_fd)
+            raise
+    finally:
+        os.close(dir_fd)
+
+
+def replace_file(path: str, data: bytes) -> None:
+    """Replace a file's contents atomically where the filesystem allows.
+
+    The data goes to an unnamed O_TMPFILE inode that is linked in and
+    renamed over path, so readers never see a partial file. An existing
+    file's permission bits are kept. Without O_TMPFILE, or when the link or
+    rename fails (gVisor refusing linkat on /proc/self/fd, a temporary name
+    past NAME_MAX), it falls back to a plain truncating write.
+    """
+    try:
+        fd = os.open(os.path.dirname(path), os.O_TMPFILE | os.O_WRONLY, 0o666)
+    except OSError:
+        _truncate_write(path, data)
+        return
+
+    try:
+        try:
+            os.fchmod(fd, stat.S_IMODE(os.stat(path).st_mode))
+        except FileNotFoundError:
+            pass
+        _write_all(fd, data)
+        try:
+            _link_over(fd, path)
+        except OSError:
+            _truncate_write(path, data)
+    finally:
+        os.close(fd)
+
+
+def append_file(path: str, data: bytes) -> None:
+    """Append to a file, creating it if needed."""
+    fd = os.open(path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o666)
+    try:
+        _write_all(fd, data)
+    finally:
+        os.close(fd)
+
+
+# Fixed JSON response bodies, serialized once at import
+HEALTH_BODY = orjson.dumps({"status": "ok"})
+INVALID_JSON_BODY = orjson.dumps({"error": "Invalid JSON"})
+MISSING_COMMAND_BODY = orjson.dumps({"error": "Missing 'command' field"})
+MISSING_PATH_BODY = orjson.dumps({"error": "Missing 'path' field"})
+MISSING_PATH_OR_CONTENT_BODY = orjson.dumps({"error": "Missing 'path' or 'content' field"})
+PATH_NOT_ALLOWED_BODY = orjson.dumps({"error": "Path not allowed"})
+READ_NOT_ALLOWED_BODY = orjson.dumps({"success": False, "error": "Path not allowed"})
+FILE_NOT_FOUND_BODY = orjson.dumps({"success": False, "error": "File not found"})
+WRITE_OK_BODY = orjson.dumps({"success": True})
+TIMED_OUT_BODY = orjson.dumps({
+    "exit_code": -1,
+    "stdout": "",
+    "stderr": "Command timed out",
+    "timed_out": True,
+})
+
+
+def static_json(body: bytes, status: int = HTTPStatus.OK) -> web.Response:
+    """Wrap a pre-serialized JSON body in a fresh response."""
+    return web.Response(body=body, status=status, content_type="application/json")
+
+
+def json_response(data: dict, status: int = HTTPStatus.OK) -> web.Response:
+    """JSON response serialized with orjson."""
+    return static_json(orjson.dumps(data), status)
+
+
+async def read_json(request: web.Request) -> dict:
+    """Parse the request body with orjson (raises orjson.JSONDecodeError)."""
+    return orjson.loads(await request.read())
+
+
+EXEC_RESULT_TEMPLATE = b'{"exit_code":%d,"stdout":%b,"stderr":%b,"timed_out":false}'
+
+
+def exec_result_body(exit_code: int, stdout: bytes, stderr: bytes) -> bytes:
+    """Serialize a finished command's result."""
+    return EXEC_RESULT_TEMPLATE % (
+        exit_code,
+        orjson.dumps(stdout.decode("utf-8", errors="replace")),
+        orjson.dumps(stderr.decode("utf-8", errors="replace")),
+    )
+
+
+# Commands made only of these characters undergo no shell expansion, quoting
+# or redirection, so their words are exactly str.split() of the command
+_PLAIN_COMMAND = re.compile(r"[\w \t.,:/@%+=-]*", re.ASCII)
+
+
+def builtin_result(command: str, workdir: str) -> bytes | None:
+    """Serialized /exec result for a trivial builtin, computed without a shell.
+
+    Handles plain echo (no options), pwd, true and false run in an existing
+    workdir; returns None for anything else.
+    """
+    if not _PLAIN_COMMAND.fullmatch(command):
+        return None
+    words = command.split()
+    if not words:
+        return None
+    name, args = words[0], words[1:]
+    if name == "echo":
+        if any(arg.startswith("-") for arg in args):
+            return None
+        return exec_result_body(0, " ".join(args).encode() + b"\n", b"")
+    if args:
+        return None
+    if name == "pwd":
+        return exec_result_body(0, os.path.abspath(workdir).encode() + b"\n", b"")
+    if name == "true":
+        return exec_result_body(0, b"", b"")
+    if name == "false":
+        return exec_result_body(1, b"", b"")
+    return None
+
+
+# SSE framing for output events; only the data string is serialized per chunk
+SSE_STREAM_PREFIXES = {
+    "stdout": b'data: {"type":"stdout","data":',
+    "stderr": b'data: {"type":"stderr","data":',
+}
+SSE_EVENT_SUFFIX = b"}\n\n"
+# Pending SSE bytes that force an immediate flush
+SSE_FLUSH_BYTES = 32 * 1024
+# Longest a pending SSE frame waits before it is flushed (seconds)
+SSE_FLUSH_DELAY = 0.002
+# Bytes read from a streamed command's pipes per read() call
+STREAM_READ_SIZE = 64 * 1024
+# Kernel buffer for a streamed command's pipes, so bursts don't stall the writer
+PIPE_BUFFER_SIZE = 1 << 20
+
+# Bytes read from a pooled shell's pipes per read() call
+SHELL_READ_SIZE = 64 * 1024
+# An "&" that starts a background job (not && or a redirection like 2>&1 or &>),
+# or a command that detaches one; these skip the shell pool
+_BACKGROUND_JOB = re.compile(r"(?<![&<>])&(?![&>])|\b(?:nohup|setsid|disown)\b")
+
+# prctl options for adopting orphaned descendants instead of leaving them to PID 1
+PR_SET_CHILD_SUBREAPER = 36
+PR_GET_CHILD_SUBREAPER = 37
+_libc = ctypes.CDLL(None, use_errno=True)
+
+
+def _can_track_children() -> bool:
+    """Whether pooled shells can adopt orphans and list them in /proc."""
+    flag = ctypes.c_int()
+    if _libc.prctl(PR_GET_CHILD_SUBREAPER, ctypes.byref(flag), 0, 0, 0) != 0:
+        return False
+    pid = os.getpid()
+    return os.path.exists(f"/proc/{pid}/task/{pid}/children")
+
+
+def _become_subreaper() -> None:
+    """preexec_fn for pooled shells: keep everything a command orphans as a child."""
+    _libc.prctl(PR_SET_CHILD_SUBREAPER, 1, 0, 0, 0)
+
+
+def _has_children(pid: int) -> bool:
+    """Whether a single-threaded process has any children, zombies included."""
+    with open(f"/proc/{pid}/task/{pid}/children", "rb") as f:
+        return bool(f.read())
+
+
+def _group_has_others(pgid: int) -> bool:
+    """Whether any process besides the leader (zombies included) is in a process group."""
+    for name in os.listdir("/proc"):
+        if not name.isdigit() or int(name) == pgid:
+            continue
+        try:
+            if os.getpgid(int(name)) == pgid:
+                return True
+        except ProcessLookupError:
+            continue
+    return False
+
+
+class SSEBatcher:
+    """Coalesces SSE frames into fewer response writes.
+
+    Frames are sent once SSE_FLUSH_BYTES are pending, or SSE_FLUSH_DELAY
+    after the first pending frame, whichever comes first.
+    """
+
+    def __init__(self, response: web.StreamResponse):
+        self._response = response
+        self._parts: list[bytes] = []
+        self._size = 0
+        self._timer: asyncio.TimerHandle | None = None
+        self._pending: asyncio.Task | None = None
+
+    async def add(self, frame: bytes) -> None:
+        self._parts.append(frame)
+        self._size += len(frame)
+        if self._size >= SSE_FLUSH_BYTES:
+            await self.flush()
+        elif self._timer is None:
+            self._timer = asyncio.get_running_loop().call_later(
+                SSE_FLUSH_DELAY, self._flush_later
+            )
+
+    def _flush_later(self) -> None:
+        self._timer = None
+        self._pending = asyncio.ensure_future(self._flush_after(self._pending))
+        # Errors resurface from the next flush(); don't log them as unretrieved
+        self._pending.add_done_callback(lambda t: t.cancelled() or t.exception())
+
+    async def _flush_after(self, previous: asyncio.Task | None) -> None:
+        """Timed flush; chained so an earlier timed flush's error isn't dropped."""
+        if previous is not None:
+            await previous
+        await self.flush()
+
+    async def flush(self) -> None:
+        """Write all pending frames as one chunk."""
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        # Frames are taken before awaiting, so transport order matches add() order
+        data = b"".join(self._parts)
+        self._parts.clear()
+        self._size = 0
+        # A timed flush stays in _pending until a later flush() awaits it
+        pending = self._pending
+        if pending is asyncio.current_task():
+            pending = None
+        else:
+            self._pending = None
+        if data:
+            await self._response.write(data)
+        if pending is not None:
+            await pending
+
+
+class ChildReaper:
+    """Reaps zombie children on SIGCHLD (PID 1 responsibility).
+
+    asyncio's child watcher waits on the processes it started by pid, so
+    those are registered here and left alone; reaping them first would make
+    asyncio report exit code 255. While a spawn is in flight its pid is not
+    known yet, so reaping is deferred until the spawn returns.
+    """
+
+    def __init__(self):
+        self._tracked: set[int] = set()
+        self._spawns_in_flight = 0
+        self._deferred = False
+
+    async def spawn(self, *args, **kwargs) -> asyncio.subprocess.Process:
+        """asyncio.create_subprocess_exec, registering the child's pid."""
+        self._spawns_in_flight += 1
+        try:
+            process = await asyncio.create_subprocess_exec(*args, **kwargs)
+            pid = process.pid
+            self._tracked.add(pid)
+            waiter = asyncio.ensure_future(process.wait())
+            waiter.add_done_callback(lambda _: self._release(pid))
+            return process
+        finally:
+            self._spawns_in_flight -= 1
+            if self._deferred and not self._spawns_in_flight:
+                self.reap()
+
+    def _release(self, pid: int) -> None:
+        self._tracked.discard(pid)
+        # A zombie queued behind this child may now be visible
+        self.reap()
+
+    def reap(self) -> None:
+        """Reap exited children that asyncio is not waiting on."""
+        if self._spawns_in_flight:
+            self._deferred = True
+            return
+        self._deferred = False
+        while True:
+            try:
+                # Peek without reaping so tracked children stay for asyncio
+                info = os.waitid(os.P_ALL, 0, os.WEXITED | os.WNOHANG | os.WNOWAIT)
+            except ChildProcessError:
+                return
+            if info is None or info.si_pid in self._tracked:
+                return
+            try:
+                os.waitpid(info.si_pid, 0)
+            except ChildProcessError:
+                pass
+
+
+child_reaper = ChildReaper()
+
+
+async def spawn_shell(
+    command: str, workdir: str, stdout: int = PIPE, stderr: int = PIPE
+) -> asyncio.subprocess.Process:
+    """Start a one-shot /bin/sh -c for a command.
+
+    On the stdlib event loop (always the case as PID 1), no preexec_fn,
+    uid/gid or group changes are requested, so CPython's _posixsubprocess
+    takes its vfork() path and never copies the server's page tables; fds
+    are closed with close_range() rather than a MAXFD loop. posix_spawn is
+    avoided because it requires close_fds=False, which would leak the
+    server's sockets into user commands. Under uvloop, libuv spawns the
+    child itself and none of this applies.
+    """
+    return await child_reaper.spawn(
+        "/bin/sh", "-c", command,
+        stdin=DEVNULL,
+        stdout=stdout,
+        stderr=stderr,
+        cwd=workdir,
+    )
+
+
+def _open_pipe() -> tuple[int, int]:
+    """Create a pipe, enlarging its kernel buffer where the system allows."""
+    read_fd, write_fd = os.pipe()
+    try:
+        fcntl.fcntl(write_fd, fcntl.F_SETPIPE_SZ, PIPE_BUFFER_SIZE)
+    except OSError:
+        pass  # Above /proc/sys/fs/pipe-max-size or unsupported; keep the default
+    return read_fd, write_fd
+
+
+async def spawn_streaming_shell(
+    command: str, workdir: str
+) -> tuple[asyncio.subprocess.Process, asyncio.StreamReader, asyncio.StreamReader]:
+    """Start a one-shot command whose stdout/stderr go through enlarged pipes.
+
+    Returns the process and StreamReaders for its stdout and stderr.
+    """
+    loop = asyncio.get_running_loop()
+    out_r, out_w = _open_pipe()
+    err_r, err_w = _open_pipe()
+    try:
+        process = await spawn_shell(command, workdir, stdout=out_w, stderr=err_w)
+    except BaseException:
+        os.close(out_r)
+        os.close(err_r)
+        raise
+    finally:
+        # The child holds its own copies; EOF arrives once it closes them
+        os.close(out_w)
+        os.close(err_w)
+
+    readers = []
+    for fd in (out_r, err_r):
+        reader = asyncio.StreamReader(limit=STREAM_READ_SIZE)
+        await loop.connect_read_pipe(
+            lambda reader=reader: asyncio.StreamReaderProtocol(reader),
+            os.fdopen(fd, "rb", buffering=0),
+        )
+        readers.append(reader)
+    return process, readers[0], readers[1]
+
+
+class ShellPool:
+    """Long-lived /bin/sh processes that run commands one at a time.
+
+    Each command runs in a subshell (so cd/exports don't leak) fed through
+    eval, followed by a random sentinel on stdout and stderr; the stdout
+    sentinel carries the exit status. This saves a fork+exec of the shell
+    and the subprocess transport setup on every /exec request.
+
+    A shell goes back to the pool only if nothing its command started is
+    still running. Otherwise it is retired without being signalled, and
+    output is read to EOF as with a one-shot sh -c, so background jobs
+    neither leak output into the next command nor get killed by a later
+    command's timeout.
+
+    Shells are child subreapers, so anything a command leaves behind,
+    setsid'd or not, is re-parented to the shell rather than to PID 1; once
+    the command's subshell has been waited for, any child of the shell is a
+    leftover. Where the kernel can't do this, the shell's process group is
+    scanned for instead, which misses jobs that called setsid().
+    """
+
+    def __init__(self, size: int):
+        self.size = size
+        self._idle: list[asyncio.subprocess.Process] = []
+        self._track_children = _can_track_children()
+
+    async def _spawn(self) -> asyncio.subprocess.Process:
+        # Own session so a timed-out command's whole process group can be killed.
+        # Only pooled shells take a preexec_fn (and so lose the vfork path);
+        # they are spawned rarely.
+        return await child_reaper.spawn(
+            "/bin/sh", "-s",
+            stdin=PIPE,
+            stdout=PIPE,
+            stderr=PIPE,
+            start_new_session=True,
+            preexec_fn=_become_subreaper if self._track_children else None,
+        )
+
+    def _has_leftovers(self, shell: asyncio.subprocess.Process) -> bool:
+        """Whether anything the last command started is still around."""
+        if self._track_children:
+            return _has_children(shell.pid)
+        return _group_has_others(shell.pid)
+
+    @staticmethod
+    async def _read_until(stream: asyncio.StreamReader, marker: bytes) -> tuple[bytearray, int]:
+        """Read until marker followed by a newline; return (data, marker index or -1 on EOF)."""
+        buf = bytearray()
+        idx = -1
+        while True:
+            chunk = await stream.read(SHELL_READ_SIZE)
+            if not chunk:
+                return buf, idx
+            search_from = max(0, len(buf) - len(marker))
+            buf += chunk
+            if idx == -1:
+                idx = buf.find(marker, search_from)
+            if idx != -1 and buf.find(b"\n", idx) != -1:
+                return buf, idx
+
+    def _kill(self, shell: asyncio.subprocess.Process) -> None:
+        try:
+            os.killpg(shell.pid, signal.SIGKILL)
+        except ProcessLookupError:
+            pass
+
+    async def _retire(self, shell: asyncio.subprocess.Process) -> None:
+        """Let a shell exit on end of input, leaving the rest of its group running."""
+        shell.stdin.close()
+        await shell.wait()
+
+    async def run(self, command: str, workdir: str, timeout: float) -> bytes:
+        """Run a command in an idle shell, spawning one if none are free.
+
+        Returns the serialized /exec result.
+        """
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + timeout
+        shell = None
+        while self._idle:
+            candidate = self._idle.pop()
+            if candidate.returncode is None:
+                shell = candidate
+                break
+        if shell is None:
+            shell = await self._spawn()
+
+        token = secrets.token_hex(16).encode()
+        script = (
+            f"(cd -- {shlex.quote(workdir)} && eval {shlex.quote(command)}) </dev/null; "
+            f"printf '%s%d\\n' {token.decode()} $?; printf '%s\\n' {token.decode()} >&2\n"
+        )
+        try:
+            shell.stdin.write(script.encode())
+            await shell.stdin.drain()
+            (out, out_idx), (err, err_idx) = await asyncio.wait_for(
+                asyncio.gather(
+                    self._read_until(shell.stdout, token),
+                    self._read_until(shell.stderr, token),
+                ),
+                timeout=timeout,
+            )
+        except asyncio.TimeoutError:
+            # Pooled shells never outlive a command's leftovers, so the group
+            # holds only this command's processes
+            self._kill(shell)
+            await shell.wait()
+            return TIMED_OUT_BODY
+        except (BrokenPipeError, ConnectionResetError):
+            self._kill(shell)
+            await shell.wait()
+            raise
+
+        if out_idx == -1 or err_idx == -1:
+            # The shell itself exited (e.g. the command killed it)
+            await self._retire(shell)
+            return exec_result_body(shell.returncode, out, err)
+
+        out_nl = out.index(b"\n", out_idx)
+        err_nl = err.index(b"\n", err_idx)
+        exit_code = int(out[out_idx + len(token):out_nl])
+        stdout, stderr = out[:out_idx], err[:err_idx]
+        late_out, late_err = out[out_nl + 1:], err[err_nl + 1:]
+        if late_out or late_err or self._has_leftovers(shell):
+            # Something the command started outlives it and may write to the
+            # shell's pipes; read them until every writer has closed them
+            shell.stdin.close()
+            try:
+                rest_out, rest_err = await asyncio.wait_for(
+                    asyncio.gather(shell.stdout.read(), shell.stderr.read()),
+                    timeout=max(0, deadline - loop.time()),
+                )
+            except asyncio.TimeoutError:
+                await shell.wait()
+                return TIMED_OUT_BODY
+            await shell.wait()
+            stdout += late_out + rest_out
+            stderr += late_err + rest_err
+        elif len(self._idle) < self.size:
+            self._idle.append(shell)
+        else:
+            await self._retire(shell)
+
+        return exec_result_body(exit_code, stdout, stderr)
+
+    async def close(self) -> None:
+        """Terminate all idle shells."""
+        while self._idle:
+            shell = self._idle.pop()
+            self._kill(shell)
+            await shell.wait()
+
+
+async def send_file(request: web.Request, f) -> web.StreamResponse:
+    """Send an open file's bytes with sendfile().
+
+    Unlike web.FileResponse, this never substitutes a precompressed
+    "<path>.gz" or "<path>.br" sibling for the requested file.
+    """
+    size = os.fstat(f.fileno()).st_size
+    response = web.StreamResponse(headers={"Content-Type": "application/octet-stream"})
+    response.content_length = size
+    await response.prepare(request)
+    if size:
+        transport = request.transport
+        if transport is None:
+            raise ConnectionResetError("Connection lost")
+        # Falls back to read/write where the transport can't sendfile
+        await asyncio.get_running_loop().sendfile(transport, f, 0, size)
+    await response.write_eof()
+    return response
+
+
 class ProcessAPI:
-    def __init__(self, memory_limit_bytes: int | None = None):
+    def __init__(
+        self,
+        memory_limit_bytes: int | None = None,
+        shell_pool_size: int = 4,
+        builtin_fast_path: bool = True,
+    ):
         self._shutdown_event = asyncio.Event()
         self._apply_memory_limit(memory_limit_bytes)
+        self._shell_pool = ShellPool(shell_pool_size) if shell_pool_size > 0 else None
+        self._builtin_fast_path = builtin_fast_path
 
     def _apply_memory_limit(self, memory_limit_bytes: int | None) -> None:
         """Apply memory limit using resource limits."""
@@ -51,56 +664,60 @@ class ProcessAPI:
 
     async def health(self, request: web.Request) -> web.Response:
         """Health check endpoint."""
-        return web.json_response({"status": "ok"})
+        return static_json(HEALTH_BODY)
 
     async def exec_command(self, request: web.Request) -> web.Response:
         """Execute a command and return the result."""
         try:
-            body = await request.json()
-        except json.JSONDecodeError:
-            return web.json_response(
-                {"error": "Invalid JSON"}, status=HTTPStatus.BAD_REQUEST
-            )
+            body = await read_json(request)
+        except orjson.JSONDecodeError:
+            return static_json(INVALID_JSON_BODY, HTTPStatus.BAD_REQUEST)
 
         command = body.get("command")
         if not command:
-            return web.json_response(
-                {"error": "Missing 'command' field"}, status=HTTPStatus.BAD_REQUEST
-            )
+            return static_json(MISSING_COMMAND_BODY, HTTPStatus.BAD_REQUEST)
 
         workdir = body.get("workdir", "/workspace")
         timeout = body.get("timeout", 30)
 
+        # A missing workdir goes through a fresh subprocess for its usual error
+        workdir_exists = os.path.isdir(workdir)
+        if self._builtin_fast_path and workdir_exists:
+            result = builtin_result(command, workdir)
+            if result is not None:
+                return static_json(result)
+
+        # Background jobs get a one-shot shell, whose pipes and process are theirs alone
+        if (
+            self._shell_pool is not None
+            and workdir_exists
+            and not _BACKGROUND_JOB.search(command)
+        ):
+            try:
+                return static_json(await self._shell_pool.run(command, workdir, timeout))
+            except Exception as e:
+                return json_response({
+                    "exit_code": -1,
+                    "stdout": "",
+                    "stderr": str(e),
+                    "timed_out": False,
+                })
+
         try:
-            process = await asyncio.create_subprocess_shell(
-                command,
-                stdout=PIPE,
-                stderr=PIPE,
-                cwd=workdir,
-            )
+            process = await spawn_shell(command, workdir)
 
             try:
                 stdout, stderr = await asyncio.wait_for(
                     process.communicate(), timeout=timeout
                 )
-                return web.json_response({
-                    "exit_code": process.returncode,
-                    "stdout": stdout.decode("utf-8", errors="replace"),
-                    "stderr": stderr.decode("utf-8", errors="replace"),
-                    "timed_out": False,
-                })
+                return static_json(exec_result_body(process.returncode, stdout, stderr))
             except asyncio.TimeoutError:
                 process.kill()
                 await process.wait()
-                return web.json_response({
-                    "exit_code": -1,
-                    "stdout": "",
-                    "stderr": "Command timed out",
-                    "timed_out": True,
-                })
+                return static_json(TIMED_OUT_BODY)
 
         except Exception as e:
-            return web.json_response({
+            return json_response({
                 "exit_code": -1,
                 "stdout": "",
                 "stderr": str(e),
@@ -110,17 +727,13 @@ class ProcessAPI:
     async def exec_stream(self, request: web.Request) -> web.StreamResponse:
         """Execute a command and stream output via Server-Sent Events."""
         try:
-            body = await request.json()
-        except json.JSONDecodeError:
-            return web.json_response(
-                {"error": "Invalid JSON"}, status=HTTPStatus.BAD_REQUEST
-            )
+            body = await read_json(request)
+        except orjson.JSONDecodeError:
+            return static_json(INVALID_JSON_BODY, HTTPStatus.BAD_REQUEST)
 
         command = body.get("command")
         if not command:
-            return web.json_response(
-                {"error": "Missing 'command' field"}, status=HTTPStatus.BAD_REQUEST
-            )
+            return static_json(MISSING_COMMAND_BODY, HTTPStatus.BAD_REQUEST)
 
         workdir = body.get("workdir", "/workspace")
 
@@ -130,37 +743,39 @@ class ProcessAPI:
                 "Content-Type": "text/event-stream",
                 "Cache-Control": "no-cache",
                 "Connection": "keep-alive",
+                "X-Accel-Buffering": "no",
             },
         )
         await response.prepare(request)
+        batcher = SSEBatcher(response)
 
         try:
-            process = await asyncio.create_subprocess_shell(
-                command,
-                stdout=PIPE,
-                stderr=PIPE,
-                cwd=workdir,
-            )
+            process, stdout, stderr = await spawn_streaming_shell(command, workdir)
 
             async def read_stream(stream, stream_type: str):
                 """Read from a stream and yield SSE events."""
+                prefix = SSE_STREAM_PREFIXES[stream_type]
+                # Incremental decoding keeps multi-byte characters split
+                # across reads intact
+                decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
                 while True:
-                    chunk = await stream.read(4096)
+                    # Returns everything already buffered (up to the limit),
+                    # so output that arrived together becomes one event
+                    chunk = await stream.read(STREAM_READ_SIZE)
+                    data = decoder.decode(chunk, final=not chunk)
+                    if data:
+                        # One allocation per frame; frames are not reused because
+                        # the transport may still hold unsent ones
+                        await batcher.add(
+                            b"".join((prefix, orjson.dumps(data), SSE_EVENT_SUFFIX))
+                        )
                     if not chunk:
                         break
-                    data = chunk.decode("utf-8", errors="replace")
-                    event = {
-                        "type": stream_type,
-                        "data": data,
-                    }
-                    await response.write(
-                        f"data: {json.dumps(event)}\n\n".encode("utf-8")
-                    )
 
             # Read stdout and stderr concurrently
             await asyncio.gather(
-                read_stream(process.stdout, "stdout"),
-                read_stream(process.stderr, "stderr"),
+                read_stream(stdout, "stdout"),
+                read_stream(stderr, "stderr"),
             )
 
             await process.wait()
@@ -170,36 +785,43 @@ class ProcessAPI:
                 "type": "exit",
                 "exit_code": process.returncode,
             }
-            await response.write(f"data: {json.dumps(exit_event)}\n\n".encode("utf-8"))
+            await batcher.add(b"data: " + orjson.dumps(exit_event) + b"\n\n")
 
         except Exception as e:
             error_event = {
                 "type": "error",
                 "data": str(e),
             }
-            await response.write(f"data: {json.dumps(error_event)}\n\n".encode("utf-8"))
+            await batcher.add(b"data: " + orjson.dumps(error_event) + b"\n\n")
 
+        await batcher.flush()
         await response.write_eof()
         return response
 
     async def write_file(self, request: web.Request) -> web.Response:
-        """Write content to a file."""
-        try:
-            body = await request.json()
-        except json.JSONDecodeError:
-            return web.json_response(
-                {"error": "Invalid JSON"}, status=HTTPStatus.BAD_REQUEST
-            )
+        """Write content to a file.
 
-        path = body.get("path")
-        content = body.get("content")
-        mode = body.get("mode", "w")
+        The body is either the raw file bytes with a percent-encoded X-Path
+        header (and optional X-Mode), or JSON with path, content and mode.
+        """
+        if "X-Path" in request.headers:
+            path = unquote(request.headers["X-Path"])
+            mode = request.headers.get("X-Mode", "w")
+            content = await request.read()
+        else:
+            try:
+                body = await read_json(request)
+            except orjson.JSONDecodeError:
+                return static_json(INVALID_JSON_BODY, HTTPStatus.BAD_REQUEST)
+
+            path = body.get("path")
+            content = body.get("content")
+            mode = body.get("mode", "w")
+            if content is not None:
+                content = content.encode("utf-8")
 
         if not path or content is None:
-            return web.json_response(
-                {"error": "Missing 'path' or 'content' field"},
-                status=HTTPStatus.BAD_REQUEST,
-            )
+            return static_json(MISSING_PATH_OR_CONTENT_BODY, HTTPStatus.BAD_REQUEST)
 
         # Security: only allow writes to /workspace or /mnt/user-data/outputs
         if not path.startswith("/"):
@@ -207,90 +829,173 @@ class ProcessAPI:
 
         # Resolve symlinks and normalize path to prevent traversal attacks
         # (e.g., /workspace/../../../etc/passwd)
-        resolved_path = os.path.realpath(path)
+        resolved_path, parent_exists = resolve_path(path)
 
-        allowed_prefixes = ["/workspace", "/mnt/user-data/outputs"]
-        if not any(resolved_path.startswith(p) for p in allowed_prefixes):
-            return web.json_response(
-                {"error": "Path not allowed"}, status=HTTPStatus.FORBIDDEN
-            )
+        # Trailing slashes keep siblings like /workspace-evil out
+        if not resolved_path.startswith(WRITE_PREFIXES):
+            return static_json(PATH_NOT_ALLOWED_BODY, HTTPStatus.FORBIDDEN)
 
         try:
             # Ensure parent directory exists
-            os.makedirs(os.path.dirname(resolved_path), exist_ok=True)
+            if not parent_exists:
+                os.makedirs(os.path.dirname(resolved_path), exist_ok=True)
 
-            write_mode = "w" if mode == "w" else "a"
-            with open(resolved_path, write_mode, encoding="utf-8") as f:
-                f.write(content)
+            if mode == "w":
+                replace_file(resolved_path, content)
+            else:
+                append_file(resolved_path, content)
 
-            return web.json_response({"success": True})
+            return static_json(WRITE_OK_BODY)
         except Exception as e:
-            return web.json_response({"success": False, "error": str(e)})
+            return json_response({"success": False, "error": str(e)})
 
     async def read_file(self, request: web.Request) -> web.Response:
         """Read content from a file."""
         try:
-            body = await request.json()
-        except json.JSONDecodeError:
-            return web.json_response(
-                {"error": "Invalid JSON"}, status=HTTPStatus.BAD_REQUEST
-            )
+            body = await read_json(request)
+        except orjson.JSONDecodeError:
+            return static_json(INVALID_JSON_BODY, HTTPStatus.BAD_REQUEST)
 
         path = body.get("path")
         if not path:
-            return web.json_response(
-                {"error": "Missing 'path' field"}, status=HTTPStatus.BAD_REQUEST
-            )
+            return static_json(MISSING_PATH_BODY, HTTPStatus.BAD_REQUEST)
 
         if not path.startswith("/"):
             path = f"/workspace/{path}"
 
         # Resolve symlinks and normalize path to prevent traversal attacks
-        resolved_path = os.path.realpath(path)
+        resolved_path, _ = resolve_path(path)
 
         # Security: only allow reads from /workspace or /mnt/user-data
-        allowed_prefixes = ["/workspace", "/mnt/user-data"]
-        if not any(resolved_path.startswith(p) for p in allowed_prefixes):
-            return web.json_response(
-                {"success": False, "error": "Path not allowed"},
-            )
+        if not resolved_path.startswith(READ_PREFIXES):
+            return static_json(READ_NOT_ALLOWED_BODY)
 
         try:
             with open(resolved_path, encoding="utf-8") as f:
                 content = f.read()
-            return web.json_response({"success": True, "content": content})
+            return json_response({"success": True, "content": content})
         except FileNotFoundError:
-            return web.json_response({"success": False, "error": "File not found"})
+            return static_json(FILE_NOT_FOUND_BODY)
         except Exception as e:
-            return web.json_response({"success": False, "error": str(e)})
+            return json_response({"success": False, "error": str(e)})
+
+    async def read_file_raw(self, request: web.Request) -> web.StreamResponse:
+        """Return a file's bytes as the response body.
+
+        Mid-sized files are gzipped (and cached) when the client accepts it;
+        everything else is sent with sendfile().
+        """
+        path = request.query.get("path")
+        if not path:
+            return static_json(MISSING_PATH_BODY, HTTPStatus.BAD_REQUEST)
+
+        if not path.startswith("/"):
+            path = f"/workspace/{path}"
+
+        resolved_path, _ = resolve_path(path)
+        if not resolved_path.startswith(READ_PREFIXES):
+            return static_json(READ_NOT_ALLOWED_BODY, HTTPStatus.FORBIDDEN)
+
+        try:
+            st = os.stat(resolved_path)
+        except FileNotFoundError:
+            return static_json(FILE_NOT_FOUND_BODY, HTTPStatus.NOT_FOUND)
+        except OSError as e:
+            return json_response({"success": False, "error": str(e)}, HTTPStatus.BAD_REQUEST)
+        if not stat.S_ISREG(st.st_mode):
+            return json_response(
+                {"success": False, "error": "Not a regular file"}, HTTPStatus.BAD_REQUEST
+            )
+
+        if (
+            GZIP_MIN_SIZE <= st.st_size <= GZIP_MAX_SIZE
+            and "gzip" in request.headers.get("Accept-Encoding", "")
+        ):
+            try:
+                body = await asyncio.to_thread(
+                    _gzip_file,
+                    resolved_path,
+                    st.st_dev,
+                    st.st_ino,
+                    st.st_size,
+                    st.st_mtime_ns,
+                    st.st_ctime_ns,
+                )
+            except OSError as e:
+                return json_response({"success": False, "error": str(e)}, HTTPStatus.BAD_REQUEST)
+            return web.Response(
+                body=body,
+                headers={
+                    "Content-Type": "application/octet-stream",
+                    "Content-Encoding": "gzip",
+                    "Vary": "Accept-Encoding",
+                },
+            )
+
+        try:
+            f = open(resolved_path, "rb")
+        except OSError as e:
+            return json_response({"success": False, "error": str(e)}, HTTPStatus.BAD_REQUEST)
+        with f:
+            return await send_file(request, f)
+
+    async def _close_shell_pool(self, app: web.Application) -> None:
+        if self._shell_pool is not None:
+            await self._shell_pool.close()
+
+    async def _install_reaper(self, app: web.Application) -> None:
+        # Only PID 1 inherits orphans; elsewhere every child is asyncio's.
+        # PID 1 always runs the stdlib loop, which allows a SIGCHLD handler.
+        if os.getpid() != 1:
+            return
+        asyncio.get_running_loop().add_signal_handler(signal.SIGCHLD, child_reaper.reap)
+        child_reaper.reap()
 
     def create_app(self) -> web.Application:
         """Create the aiohttp application."""
         app = web.Application()
+        app.on_startup.append(self._install_reaper)
+        app.on_cleanup.append(self._close_shell_pool)
         app.router.add_get("/health", self.health)
         app.router.add_post("/exec", self.exec_command)
         app.router.add_post("/exec/stream", self.exec_stream)
         app.router.add_post("/file/write", self.write_file)
         app.router.add_post("/file/read", self.read_file)
+        app.router.add_get("/file/raw", self.read_file_raw)
         return app
 
 
-def reap_zombies():
-    """Reap zombie child processes (PID 1 responsibility)."""
-    while True:
-        try:
-            pid, _ = os.waitpid(-1, os.WNOHANG)
-            if pid == 0:
-                break
-        except ChildProcessError:
-            break
+def use_uvloop() -> bool:
+    """Run on uvloop's libuv event loop when it is installed.
+
+    uvloop waits for subprocesses itself, so no child watcher is needed.
+    Not used as PID 1: uvloop reserves SIGCHLD for libuv, and the orphan
+    reaper needs it.
+    """
+    if os.getpid() == 1:
+        return False
+    try:
+        import uvloop
+    except ImportError:
+        return False
+    asyncio.set_event_loop_policy(uvloop.EventLoopPolicy())
+    return True
+
 
+def use_pidfd_child_watcher() -> None:
+    """Wait for subprocesses through pidfds instead of a thread per child.
 
-async def zombie_reaper():
-    """Periodically reap zombie processes."""
-    while True:
-        await asyncio.sleep(1)
-        reap_zombies()
+    Python 3.12+ already defaults to this when pidfd_open works (and
+    deprecates setting watchers); older versions default to
+    ThreadedChildWatcher, which blocks a thread in waitpid per process.
+    """
+    if sys.version_info >= (3, 12) or not hasattr(asyncio, "PidfdChildWatcher"):
+        return
+    try:
+        os.close(os.pidfd_open(os.getpid()))
+    except (AttributeError, OSError):
+        return  # Kernel < 5.3 or sandbox without pidfd support
+    asyncio.set_child_watcher(asyncio.PidfdChildWatcher())
 
 
 def main():
@@ -306,14 +1011,41 @@ def main():
         default=None,
         help="Memory limit in bytes (enforced via resource limits)",
     )
+    parser.add_argument(
+        "--shell-pool-size",
+        type=int,
+        default=4,
+        help="Idle shells kept for /exec; 0 spawns a shell per command (default: 4)",
+    )
+    parser.add_argument(
+        "--builtin-fast-path",
+        action=argparse.BooleanOptionalAction,
+        default=True,
+        help="Answer plain echo/pwd/true/false in /exec without a shell (default: on)",
+    )
+    parser.add_argument(
+        "--access-log",
+        action=argparse.BooleanOptionalAction,
+        default=False,
+        help="Log every request (default: off)",
+    )
     args = parser.parse_args()
 
     host, port = args.addr.rsplit(":", 1)
     port = int(port)
 
-    api = ProcessAPI(memory_limit_bytes=args.memory_limit_bytes)
+    api = ProcessAPI(
+        memory_limit_bytes=args.memory_limit_bytes,
+        shell_pool_size=args.shell_pool_size,
+        builtin_fast_path=args.builtin_fast_path,
+    )
     app = api.create_app()
 
+    if use_uvloop():
+        logger.info("Using uvloop event loop")
+    else:
+        use_pidfd_child_watcher()
+
     # Setup signal handlers
     loop = asyncio.new_event_loop()
     asyncio.set_event_loop(loop)
@@ -325,12 +1057,15 @@ def main():
     for sig in (signal.SIGTERM, signal.SIGINT):
         loop.add_signal_handler(sig, handle_signal, sig)
 
-    # Start zombie reaper task
-    loop.create_task(zombie_reaper())
-
     logger.info(f"process_api listening on {host}:{port}")
 
-    web.run_app(app, host=host, port=port, print=None)
+    web.run_app(
+        app,
+        host=host,
+        port=port,
+        print=None,
+        access_log=web.access_logger if args.access_log else None,
+    )
 
 
 if __name__ == "__main__":
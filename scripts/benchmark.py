@@ -15,129 +15,409 @@ Requires the gRPC server to be running (make dev).
 """
 
 import argparse
+import asyncio
+import bisect
+import functools
 import gc
+import glob
+import itertools
+import json
+import math
+import re
 import statistics
 import subprocess
+import threading
 import time
-from concurrent.futures import ThreadPoolExecutor, as_completed
-from dataclasses import dataclass
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
 
 import grpc
+import grpc.aio
 import plotext as plt
 from sandbox.v1 import sandbox_pb2, sandbox_pb2_grpc
 
-
-@dataclass
+SERVER_ADDRESS = "localhost:50051"
+# Timings are taken with perf_counter_ns and only converted when reported
+NS_PER_MS = 1_000_000
+HISTOGRAM_BINS = 15
+# Exec's method path, for calling it on a bare channel without protobuf codecs
+EXEC_METHOD = "/sandbox.v1.SandboxService/Exec"
+# Percentiles printed by --tail-percentiles
+TAIL_PERCENTILES = (50, 75, 90, 95, 99, 99.9, 99.99)
+# Untimed iterations run before each benchmark records samples
+WARMUP_ITERATIONS = 3
+# Give each channel its own connection and never throttle its keepalive pings
+CHANNEL_OPTIONS = [
+    ("grpc.use_local_subchannel_pool", 1),
+    ("grpc.http2.max_pings_without_data", 0),
+]
+
+
+@dataclass(slots=True)
 class BenchmarkResult:
     name: str
     samples: list[float]
     unit: str = "ms"
+    # Summary statistics, computed once from the samples
+    mean: float = field(init=False)
+    median: float = field(init=False)
+    std_dev: float = field(init=False)
+    min: float = field(init=False)
+    max: float = field(init=False)
+    p95: float = field(init=False)
+    p99: float = field(init=False)
+    sorted_samples: list[float] = field(init=False, repr=False)
+
+    def __post_init__(self):
+        self.sorted_samples = sorted_samples = sorted(self.samples)
+        self.mean = statistics.fmean(sorted_samples)
+        # statistics.median would sort its input again
+        middle = len(sorted_samples) // 2
+        self.median = (
+            sorted_samples[middle]
+            if len(sorted_samples) % 2
+            else (sorted_samples[middle - 1] + sorted_samples[middle]) / 2
+        )
+        self.std_dev = statistics.stdev(sorted_samples, self.mean) if len(sorted_samples) > 1 else 0
+        self.min = sorted_samples[0]
+        self.max = sorted_samples[-1]
+        self.p95 = self.percentile(95)
+        self.p99 = self.percentile(99)
+
+    def percentile(self, q: float) -> float:
+        """Nearest-rank percentile (as HDR reports it), read from the sorted samples."""
+        rank = math.ceil(len(self.sorted_samples) * q / 100)
+        return self.sorted_samples[max(rank, 1) - 1]
+
+    def percentiles(self, qs: tuple[float, ...]) -> list[float]:
+        """Several percentiles at once; each is an index into the sorted samples."""
+        return [self.percentile(q) for q in qs]
+
+    def binned(self, bins: int) -> tuple[list[float], list[int]]:
+        """Bin centers and counts, found by bisecting the sorted samples."""
+        width, centers = bin_layout(self.min, self.max, bins)
+        # Index of the first sample in each bin after the first; the top bin
+        # also takes the maximum
+        starts = [
+            bisect.bisect_left(self.sorted_samples, self.min + width * i) for i in range(1, bins)
+        ]
+        bounds = [0, *starts, len(self.sorted_samples)]
+        return centers, [bounds[i + 1] - bounds[i] for i in range(bins)]
+
+    def stats_str(self) -> str:
+        return format_stats(self)
+
+
+class HistogramResult:
+    """Latency summary kept in an HDR histogram instead of a sample list.
+
+    Memory stays constant however many iterations run, so long runs can
+    measure tail latency. Used with --streaming-stats; needs hdrhistogram.
+    """
+
+    def __init__(self, name: str):
+        from hdrh.histogram import HdrHistogram
+
+        self.name = name
+        self.unit = "ms"
+        # Raw nanoseconds from 1 ns to 60 s, 3 significant digits
+        self.histogram = HdrHistogram(1, 60 * 1000 * NS_PER_MS, 3)
+
+    @classmethod
+    def decode(cls, name: str, encoded: str) -> "HistogramResult":
+        """Rebuild a result from HdrHistogram's base64 encoding (see encode)."""
+        from hdrh.histogram import HdrHistogram
+
+        result = cls(name)
+        result.histogram = HdrHistogram.decode(encoded.encode())
+        return result
+
+    def encode(self) -> str:
+        return self.histogram.encode().decode()
+
+    def record_ns(self, elapsed_ns: int) -> None:
+        self.histogram.record_value(max(1, elapsed_ns))
+
+    def percentile(self, q: float) -> float:
+        return self.histogram.get_value_at_percentile(q) / NS_PER_MS
+
+    def percentiles(self, qs: tuple[float, ...]) -> list[float]:
+        """Several percentiles from a single walk over the histogram's buckets."""
+        values = self.histogram.get_percentile_to_value_dict(list(qs))
+        return [values[q] / NS_PER_MS for q in qs]
 
     @property
     def mean(self) -> float:
-        return statistics.mean(self.samples)
+        return self.histogram.get_mean_value() / NS_PER_MS
 
     @property
     def median(self) -> float:
-        return statistics.median(self.samples)
+        return self.percentile(50)
 
     @property
     def std_dev(self) -> float:
-        return statistics.stdev(self.samples) if len(self.samples) > 1 else 0
+        return self.histogram.get_stddev() / NS_PER_MS
 
     @property
     def min(self) -> float:
-        return min(self.samples)
+        return self.histogram.get_min_value() / NS_PER_MS
 
     @property
     def max(self) -> float:
-        return max(self.samples)
+        return self.histogram.get_max_value() / NS_PER_MS
 
     @property
     def p95(self) -> float:
-        sorted_samples = sorted(self.samples)
-        idx = int(len(sorted_samples) * 0.95)
-        return sorted_samples[min(idx, len(sorted_samples) - 1)]
+        return self.percentile(95)
+
+    @property
+    def p99(self) -> float:
+        return self.percentile(99)
+
+    def binned(self, bins: int) -> tuple[list[float], list[int]]:
+        """Bin centers and counts, regrouped from the histogram's buckets."""
+        width, centers = bin_layout(self.min, self.max, bins)
+        counts = [0] * bins
+        for bucket in self.histogram.get_recorded_iterator():
+            value = bucket.value_iterated_to / NS_PER_MS
+            index = min(max(int((value - self.min) / width), 0), bins - 1)
+            counts[index] += bucket.count_added_in_this_iter_step
+        return centers, counts
 
     def stats_str(self) -> str:
-        return (
-            f"  Mean: {self.mean:.2f} {self.unit} | "
-            f"Median: {self.median:.2f} {self.unit} | "
-            f"P95: {self.p95:.2f} {self.unit} | "
-            f"Min: {self.min:.2f} | Max: {self.max:.2f}"
-        )
+        return format_stats(self)
+
+
+def bin_layout(low: float, high: float, bins: int) -> tuple[float, list[float]]:
+    """Width and centers of equal bins spanning [low, high]."""
+    width = (high - low) / bins or 1.0
+    return width, [low + width * (i + 0.5) for i in range(bins)]
+
+
+def format_stats(result: BenchmarkResult | HistogramResult) -> str:
+    return (
+        f"  Mean: {result.mean:.2f} {result.unit} | "
+        f"Median: {result.median:.2f} {result.unit} | "
+        f"P95: {result.p95:.2f} {result.unit} | "
+        f"P99: {result.p99:.2f} {result.unit} | "
+        f"Min: {result.min:.2f} | Max: {result.max:.2f}"
+    )
+
+
+def ns_to_ms(samples_ns: list[int]) -> list[float]:
+    """Convert nanosecond timings to milliseconds for reporting."""
+    return [sample / NS_PER_MS for sample in samples_ns]
 
 
 def get_stub() -> sandbox_pb2_grpc.SandboxServiceStub:
-    """Create a gRPC stub."""
-    channel = grpc.insecure_channel("localhost:50051")
+    """Create the gRPC stub shared by all benchmarks, with its channel connected.
+
+    Connecting up front keeps TCP and HTTP/2 setup out of the first timed call.
+    """
+    channel = grpc.insecure_channel(SERVER_ADDRESS, options=CHANNEL_OPTIONS)
+    grpc.channel_ready_future(channel).result(timeout=10)
     return sandbox_pb2_grpc.SandboxServiceStub(channel)
 
 
+# memory.current (cgroup v2, systemd or cgroupfs driver) or usage_in_bytes (v1);
+# container IDs from the server are short, hence the wildcard
+CGROUP_MEMORY_PATTERNS = (
+    "/sys/fs/cgroup/system.slice/docker-{id}*.scope/memory.current",
+    "/sys/fs/cgroup/docker/{id}*/memory.current",
+    "/sys/fs/cgroup/memory/docker/{id}*/memory.usage_in_bytes",
+)
+
+
+@functools.lru_cache
+def find_cgroup_memory_file(container_id: str) -> str | None:
+    """Locate a container's cgroup memory usage file on this host."""
+    for pattern in CGROUP_MEMORY_PATTERNS:
+        matches = glob.glob(pattern.format(id=container_id))
+        if matches:
+            return matches[0]
+    return None
+
+
 def get_container_memory_mb(container_id: str) -> float:
-    """Get memory usage of a container in MB."""
-    try:
-        result = subprocess.run(
-            ["docker", "stats", "--no-stream", "--format", "{{.MemUsage}}", container_id],
-            capture_output=True,
-            text=True,
-            timeout=5,
-        )
-        # Output like "50.5MiB / 4GiB"
-        mem_str = result.stdout.strip().split("/")[0].strip()
-        if "GiB" in mem_str:
-            return float(mem_str.replace("GiB", "")) * 1024
-        elif "MiB" in mem_str:
-            return float(mem_str.replace("MiB", ""))
-        elif "KiB" in mem_str:
-            return float(mem_str.replace("KiB", "")) / 1024
+    """Get memory usage of a container in MB, read from its cgroup."""
+    path = find_cgroup_memory_file(container_id)
+    if path is None:
         return 0
-    except Exception:
+    try:
+        with open(path) as f:
+            return int(f.read()) / (1024 * 1024)
+    except (OSError, ValueError):
         return 0
 
 
-def benchmark_cold_start(stub: sandbox_pb2_grpc.SandboxServiceStub, iterations: int = 10) -> BenchmarkResult:
+def get_settled_memory_mb(container_id: str, timeout: float = 5.0) -> float:
+    """Poll a container's memory until consecutive reads differ by under 1%."""
+    previous = get_container_memory_mb(container_id)
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        time.sleep(0.05)
+        current = get_container_memory_mb(container_id)
+        if previous and abs(current - previous) < previous * 0.01:
+            return current
+        previous = current
+    return previous
+
+
+# `docker stats` lines look like "<container> 12.5MiB / 1.9GiB", each refresh
+# prefixed with terminal escape codes
+DOCKER_STATS_FORMAT = "{{.Container}} {{.MemUsage}}"
+DOCKER_STATS_LINE = re.compile(r"(?:\x1b\[[0-9;]*[A-Za-z])*(\S+) ([\d.]+)([kKMGT]?i?B) /")
+BYTE_UNITS = {
+    "B": 1,
+    "kB": 1000,
+    "KiB": 1024,
+    "MB": 1000**2,
+    "MiB": 1024**2,
+    "GB": 1000**3,
+    "GiB": 1024**3,
+    "TB": 1000**4,
+    "TiB": 1024**4,
+}
+
+
+class DockerStatsStream:
+    """Memory usage of several containers from one long-lived `docker stats`.
+
+    Used when the containers' cgroups aren't visible from this host (e.g.
+    Docker Desktop's VM), instead of a stats request per container per poll.
+    """
+
+    def __init__(self, container_ids: list[str]):
+        self.samples: dict[str, list[float]] = {container_id: [] for container_id in container_ids}
+        self.updated = threading.Condition()
+        self.process = subprocess.Popen(
+            ["docker", "stats", "--format", DOCKER_STATS_FORMAT, *container_ids],
+            stdout=subprocess.PIPE,
+            stderr=subprocess.DEVNULL,
+            text=True,
+        )
+        threading.Thread(target=self._read, daemon=True).start()
+
+    def _read(self) -> None:
+        for line in self.process.stdout:
+            match = DOCKER_STATS_LINE.match(line)
+            if match is None:
+                continue
+            container_id, value, unit = match.groups()
+            with self.updated:
+                if container_id in self.samples:
+                    self.samples[container_id].append(
+                        float(value) * BYTE_UNITS.get(unit, 1) / (1024 * 1024)
+                    )
+                self.updated.notify_all()
+        # docker exited; wake waiters so they stop on the process check
+        with self.updated:
+            self.updated.notify_all()
+
+    def get_settled_memory_mb(self, container_id: str, timeout: float = 10.0) -> float:
+        """Wait until consecutive samples for a container differ by under 1%."""
+        samples = self.samples[container_id]
+        deadline = time.monotonic() + timeout
+        with self.updated:
+            while not (len(samples) > 1 and abs(samples[-1] - samples[-2]) < samples[-2] * 0.01):
+                remaining = deadline - time.monotonic()
+                if remaining <= 0 or self.process.poll() is not None:
+                    break
+                self.updated.wait(remaining)
+            return samples[-1] if samples else 0
+
+    def close(self) -> None:
+        self.process.terminate()
+        self.process.wait()
+
+
+def create_sessions(
+    stub: sandbox_pb2_grpc.SandboxServiceStub, count: int
+) -> list[sandbox_pb2.CreateSessionResponse]:
+    """Create sessions with every RPC in flight at once on the shared channel."""
+    request = sandbox_pb2.CreateSessionRequest()
+    futures = [stub.CreateSession.future(request) for _ in range(count)]
+    return [future.result() for future in futures]
+
+
+def destroy_sessions(stub: sandbox_pb2_grpc.SandboxServiceStub, session_ids: list[str]) -> None:
+    """Destroy sessions with every RPC in flight at once on the shared channel."""
+    futures = [
+        stub.DestroySession.future(sandbox_pb2.DestroySessionRequest(session_id=session_id))
+        for session_id in session_ids
+    ]
+    for future in futures:
+        future.result()
+
+
+def benchmark_cold_start(
+    stub: sandbox_pb2_grpc.SandboxServiceStub,
+    iterations: int = 10,
+    warmup: int = WARMUP_ITERATIONS,
+) -> BenchmarkResult:
     """Benchmark session creation time (cold start)."""
     print(f"\n[1/4] Cold Start Latency ({iterations} iterations)...")
-    samples = []
+
+    # Built once so the timed region is only the RPC
+    request = sandbox_pb2.CreateSessionRequest()
+
+    print(f"  Warmup: {warmup} throwaway sessions")
+    for _ in range(warmup):
+        response = stub.CreateSession(request)
+        stub.DestroySession(sandbox_pb2.DestroySessionRequest(session_id=response.session.session_id))
+
+    samples_ns = []
 
     for i in range(iterations):
         gc.collect()
 
-        start = time.perf_counter()
-        response = stub.CreateSession(sandbox_pb2.CreateSessionRequest())
-        elapsed = (time.perf_counter() - start) * 1000  # ms
+        start = time.perf_counter_ns()
+        response = stub.CreateSession(request)
+        elapsed_ns = time.perf_counter_ns() - start
 
-        samples.append(elapsed)
-        print(f"  Iteration {i+1}: {elapsed:.2f} ms")
+        samples_ns.append(elapsed_ns)
+        print(f"  Iteration {i+1}: {elapsed_ns / NS_PER_MS:.2f} ms")
 
         # Cleanup
         stub.DestroySession(sandbox_pb2.DestroySessionRequest(session_id=response.session.session_id))
 
-    return BenchmarkResult("Cold Start Latency", samples)
+    return BenchmarkResult("Cold Start Latency", ns_to_ms(samples_ns))
 
 
-def benchmark_exec_latency(stub: sandbox_pb2_grpc.SandboxServiceStub, iterations: int = 50) -> BenchmarkResult:
-    """Benchmark command execution latency."""
+def benchmark_exec_latency(
+    stub: sandbox_pb2_grpc.SandboxServiceStub,
+    iterations: int = 50,
+    streaming: bool = False,
+    warmup: int = WARMUP_ITERATIONS,
+) -> BenchmarkResult | HistogramResult:
+    """Benchmark command execution latency.
+
+    With streaming, latencies go into an HDR histogram rather than a list.
+    """
     print(f"\n[2/4] Command Execution Latency ({iterations} iterations)...")
 
     # Create a session first
     response = stub.CreateSession(sandbox_pb2.CreateSessionRequest())
     session_id = response.session.session_id
 
-    # Warm up
-    stub.Exec(sandbox_pb2.ExecRequest(session_id=session_id, command="echo warmup", timeout=10))
+    # Built once so the timed region is only the RPC
+    request = sandbox_pb2.ExecRequest(session_id=session_id, command="echo hello", timeout=10)
 
-    samples = []
+    print(f"  Warmup: {warmup} iterations")
+    for _ in range(warmup):
+        stub.Exec(request)
+
+    name = "Exec Latency (echo hello)"
+    histogram = HistogramResult(name) if streaming else None
+    samples_ns = []
     for i in range(iterations):
-        start = time.perf_counter()
-        stub.Exec(sandbox_pb2.ExecRequest(
-            session_id=session_id,
-            command="echo hello",
-            timeout=10,
-        ))
-        elapsed = (time.perf_counter() - start) * 1000  # ms
-        samples.append(elapsed)
+        start = time.perf_counter_ns()
+        stub.Exec(request)
+        elapsed_ns = time.perf_counter_ns() - start
+        if histogram is None:
+            samples_ns.append(elapsed_ns)
+        else:
+            histogram.record_ns(elapsed_ns)
 
         if (i + 1) % 10 == 0:
             print(f"  Progress: {i+1}/{iterations}")
@@ -145,86 +425,223 @@ def benchmark_exec_latency(stub: sandbox_pb2_grpc.SandboxServiceStub, iterations
     # Cleanup
     stub.DestroySession(sandbox_pb2.DestroySessionRequest(session_id=session_id))
 
-    return BenchmarkResult("Exec Latency (echo hello)", samples)
+    return histogram or BenchmarkResult(name, ns_to_ms(samples_ns))
+
+
+def benchmark_exec_stream_latency(
+    stub: sandbox_pb2_grpc.SandboxServiceStub,
+    iterations: int = 50,
+    warmup: int = WARMUP_ITERATIONS,
+) -> tuple[BenchmarkResult, BenchmarkResult]:
+    """Benchmark ExecStream, timing the first chunk and the full stream separately."""
+    print(f"\n[2/4] Streaming Exec Latency ({iterations} iterations)...")
+
+    response = stub.CreateSession(sandbox_pb2.CreateSessionRequest())
+    session_id = response.session.session_id
+
+    request = sandbox_pb2.ExecStreamRequest(session_id=session_id, command="echo hello")
+
+    print(f"  Warmup: {warmup} iterations")
+    for _ in range(warmup):
+        for _ in stub.ExecStream(request):
+            pass
+
+    first_chunk_ns = []
+    total_ns = []
+    for i in range(iterations):
+        start = time.perf_counter_ns()
+        chunks = iter(stub.ExecStream(request))
+        next(chunks)
+        first_chunk_ns.append(time.perf_counter_ns() - start)
+        for _ in chunks:
+            pass
+        total_ns.append(time.perf_counter_ns() - start)
+
+        if (i + 1) % 10 == 0:
+            print(f"  Progress: {i+1}/{iterations}")
+
+    stub.DestroySession(sandbox_pb2.DestroySessionRequest(session_id=session_id))
+
+    return (
+        BenchmarkResult("ExecStream First Chunk (echo hello)", ns_to_ms(first_chunk_ns)),
+        BenchmarkResult("ExecStream Total (echo hello)", ns_to_ms(total_ns)),
+    )
+
+
+def benchmark_exec_raw(
+    iterations: int = 50, warmup: int = WARMUP_ITERATIONS
+) -> tuple[BenchmarkResult, BenchmarkResult]:
+    """Time Exec through the generated stub and as raw bytes on the same channel.
+
+    The raw call sends a pre-serialized request and leaves the response
+    unparsed, so the gap between the two is protobuf encode/decode cost.
+    Calls alternate so drift affects both sides equally.
+    """
+    print(f"\n[2/4] Exec Transport vs Protobuf ({iterations} iterations)...")
+
+    channel = grpc.insecure_channel(SERVER_ADDRESS, options=CHANNEL_OPTIONS)
+    grpc.channel_ready_future(channel).result(timeout=10)
+    stub = sandbox_pb2_grpc.SandboxServiceStub(channel)
+    # No serializer/deserializer: bytes go in and come back out untouched
+    raw_exec = channel.unary_unary(EXEC_METHOD)
+
+    response = stub.CreateSession(sandbox_pb2.CreateSessionRequest())
+    session_id = response.session.session_id
+
+    request = sandbox_pb2.ExecRequest(session_id=session_id, command="echo hello", timeout=10)
+    serialized_request = request.SerializeToString()
+
+    print(f"  Warmup: {warmup} iterations")
+    for _ in range(warmup):
+        stub.Exec(request)
+        raw_exec(serialized_request)
+
+    stub_ns = []
+    raw_ns = []
+    for i in range(iterations):
+        start = time.perf_counter_ns()
+        stub.Exec(request)
+        stub_ns.append(time.perf_counter_ns() - start)
+
+        start = time.perf_counter_ns()
+        raw_exec(serialized_request)
+        raw_ns.append(time.perf_counter_ns() - start)
+
+        if (i + 1) % 10 == 0:
+            print(f"  Progress: {i+1}/{iterations}")
+
+    stub.DestroySession(sandbox_pb2.DestroySessionRequest(session_id=session_id))
+    channel.close()
+
+    return (
+        BenchmarkResult("Exec via Stub (echo hello)", ns_to_ms(stub_ns)),
+        BenchmarkResult("Exec as Raw Bytes (echo hello)", ns_to_ms(raw_ns)),
+    )
 
 
 def benchmark_memory_overhead(stub: sandbox_pb2_grpc.SandboxServiceStub, sessions: int = 5) -> BenchmarkResult:
     """Benchmark per-session memory overhead."""
     print(f"\n[3/4] Memory Overhead ({sessions} sessions)...")
 
-    session_ids = []
-    container_ids = []
-    samples = []
+    # Start all sessions at once, then let each container settle in parallel
+    responses = create_sessions(stub, sessions)
+    session_ids = [response.session.session_id for response in responses]
+    container_ids = [response.session.container_id for response in responses]
+    if all(find_cgroup_memory_file(container_id) for container_id in container_ids):
+        with ThreadPoolExecutor(max_workers=sessions) as executor:
+            samples = list(executor.map(get_settled_memory_mb, container_ids))
+    else:
+        stats = DockerStatsStream(container_ids)
+        try:
+            samples = [stats.get_settled_memory_mb(container_id) for container_id in container_ids]
+        finally:
+            stats.close()
+
+    for i, mem_mb in enumerate(samples):
+        print(f"  Session {i+1}: {mem_mb:.1f} MB")
 
-    for i in range(sessions):
-        response = stub.CreateSession(sandbox_pb2.CreateSessionRequest())
-        session_ids.append(response.session.session_id)
-        container_ids.append(response.session.container_id)
+    destroy_sessions(stub, session_ids)
 
-        # Let container settle
-        time.sleep(1)
+    return BenchmarkResult("Memory per Session", samples, unit="MB")
 
-        # Measure memory
-        mem_mb = get_container_memory_mb(response.session.container_id)
-        samples.append(mem_mb)
-        print(f"  Session {i+1}: {mem_mb:.1f} MB")
 
-    # Cleanup
-    for session_id in session_ids:
-        stub.DestroySession(sandbox_pb2.DestroySessionRequest(session_id=session_id))
+class ChannelPool:
+    """Async channels, each on its own connection, with stubs handed out round-robin.
 
-    return BenchmarkResult("Memory per Session", samples, unit="MB")
+    Spreading concurrent calls over several connections keeps one TCP
+    connection's head-of-line blocking out of the measurement.
+    """
+
+    def __init__(self, size: int):
+        self.channels = [
+            grpc.aio.insecure_channel(SERVER_ADDRESS, options=CHANNEL_OPTIONS)
+            for _ in range(size)
+        ]
+        self.stubs = [sandbox_pb2_grpc.SandboxServiceStub(channel) for channel in self.channels]
+        self._stubs = itertools.cycle(self.stubs)
+
+    def next_stub(self) -> sandbox_pb2_grpc.SandboxServiceStub:
+        return next(self._stubs)
+
+    async def ready(self) -> None:
+        await asyncio.gather(*(channel.channel_ready() for channel in self.channels))
+
+    async def close(self) -> None:
+        await asyncio.gather(*(channel.close() for channel in self.channels))
+
+
+async def exec_concurrently(
+    session_ids: list[str], channels: int, warmup: int = WARMUP_ITERATIONS
+) -> tuple[list[int], int]:
+    """Run one exec per session at once, spread over a pool of channels.
+
+    The batch is first run `warmup` times untimed. Returns each call's latency
+    and the whole batch's wall time, in nanoseconds.
+    """
+    pool = ChannelPool(channels)
+    try:
+        # Connect before timing so no sample includes channel setup
+        await pool.ready()
+
+        async def exec_on_session(session_id: str) -> int:
+            stub = pool.next_stub()
+            start = time.perf_counter_ns()
+            await stub.Exec(sandbox_pb2.ExecRequest(
+                session_id=session_id,
+                command="echo hello",
+                timeout=10,
+            ))
+            return time.perf_counter_ns() - start
+
+        for _ in range(warmup):
+            await asyncio.gather(*(exec_on_session(sid) for sid in session_ids))
+
+        start = time.perf_counter_ns()
+        latencies_ns = await asyncio.gather(*(exec_on_session(sid) for sid in session_ids))
+        return latencies_ns, time.perf_counter_ns() - start
+    finally:
+        await pool.close()
 
 
 def benchmark_concurrent_sessions(
     stub: sandbox_pb2_grpc.SandboxServiceStub,
     max_sessions: int = 20,
     step: int = 5,
+    channels: int = 4,
+    warmup: int = WARMUP_ITERATIONS,
 ) -> list[tuple[int, float]]:
     """Benchmark latency degradation with concurrent sessions."""
     print(f"\n[4/4] Concurrent Sessions (up to {max_sessions})...")
+    print(f"  Warmup: {warmup} untimed rounds per step")
 
     results = []
     active_sessions = []
 
     for target_count in range(step, max_sessions + 1, step):
         # Create sessions to reach target
-        while len(active_sessions) < target_count:
-            response = stub.CreateSession(sandbox_pb2.CreateSessionRequest())
-            active_sessions.append(response.session.session_id)
+        responses = create_sessions(stub, target_count - len(active_sessions))
+        active_sessions.extend(response.session.session_id for response in responses)
 
         # Measure exec latency across all sessions
-        latencies = []
+        latencies_ns, wall_ns = asyncio.run(exec_concurrently(active_sessions, channels, warmup))
 
-        def exec_on_session(session_id: str) -> float:
-            start = time.perf_counter()
-            stub.Exec(sandbox_pb2.ExecRequest(
-                session_id=session_id,
-                command="echo hello",
-                timeout=10,
-            ))
-            return (time.perf_counter() - start) * 1000
-
-        with ThreadPoolExecutor(max_workers=target_count) as executor:
-            futures = [executor.submit(exec_on_session, sid) for sid in active_sessions]
-            for future in as_completed(futures):
-                latencies.append(future.result())
-
-        avg_latency = statistics.mean(latencies)
+        avg_latency = statistics.fmean(latencies_ns) / NS_PER_MS
         results.append((target_count, avg_latency))
-        print(f"  {target_count} sessions: avg exec latency = {avg_latency:.2f} ms")
+        print(
+            f"  {target_count} sessions: avg exec latency = {avg_latency:.2f} ms, "
+            f"all done in {wall_ns / NS_PER_MS:.2f} ms"
+        )
 
-    # Cleanup
-    for session_id in active_sessions:
-        stub.DestroySession(sandbox_pb2.DestroySessionRequest(session_id=session_id))
+    destroy_sessions(stub, active_sessions)
 
     return results
 
 
-def plot_histogram(result: BenchmarkResult, title: str):
-    """Plot a histogram of samples."""
+def plot_histogram(result: BenchmarkResult | HistogramResult, title: str):
+    """Plot a histogram of samples, binned by the result itself."""
+    centers, counts = result.binned(HISTOGRAM_BINS)
     plt.clear_figure()
-    plt.hist(result.samples, bins=15)
+    plt.bar([round(center, 2) for center in centers], counts)
     plt.title(title)
     plt.xlabel(f"Latency ({result.unit})")
     plt.ylabel("Frequency")
@@ -273,6 +690,19 @@ def print_summary(results: dict):
         print("\n")
         plot_histogram(results["exec"], "Command Execution Latency Distribution")
 
+    # Streaming exec latency histograms
+    if "exec_stream" in results:
+        first_chunk, total = results["exec_stream"]
+        print("\n")
+        plot_histogram(first_chunk, "ExecStream First Chunk Latency Distribution")
+        print("\n")
+        plot_histogram(total, "ExecStream Total Latency Distribution")
+
+    # Raw-bytes exec latency histogram
+    if "exec_raw" in results:
+        print("\n")
+        plot_histogram(results["exec_raw"][1], "Raw-Bytes Exec Latency Distribution")
+
     # Memory bar chart
     if "memory" in results:
         print("\n")
@@ -305,6 +735,19 @@ def print_summary(results: dict):
         r = results["exec"]
         print(f"{'Exec Latency (median)':<30} {r.median:>15.2f} {'ms':<10}")
         print(f"{'Exec Latency (p95)':<30} {r.p95:>15.2f} {'ms':<10}")
+        print(f"{'Exec Latency (p99)':<30} {r.p99:>15.2f} {'ms':<10}")
+
+    if "exec_stream" in results:
+        first_chunk, total = results["exec_stream"]
+        print(f"{'ExecStream 1st chunk (median)':<30} {first_chunk.median:>15.2f} {'ms':<10}")
+        print(f"{'ExecStream total (median)':<30} {total.median:>15.2f} {'ms':<10}")
+        print(f"{'ExecStream total (p95)':<30} {total.p95:>15.2f} {'ms':<10}")
+
+    if "exec_raw" in results:
+        via_stub, raw = results["exec_raw"]
+        print(f"{'Exec raw bytes (median)':<30} {raw.median:>15.2f} {'ms':<10}")
+        overhead = via_stub.median - raw.median
+        print(f"{'Protobuf overhead (median)':<30} {overhead:>15.3f} {'ms':<10}")
 
     if "memory" in results:
         r = results["memory"]
@@ -319,15 +762,124 @@ def print_summary(results: dict):
             print(f"{'Latency @ {0} sessions'.format(last[0]):<30} {last[1]:>15.2f} {'ms':<10}")
 
 
+def print_tail_percentiles(results: dict):
+    """Print a percentile sweep for every latency result."""
+    latency_results = []
+    for key in ("cold_start", "exec", "exec_stream", "exec_raw"):
+        value = results.get(key)
+        if isinstance(value, tuple):
+            latency_results.extend(value)
+        elif value is not None:
+            latency_results.append(value)
+    if not latency_results:
+        return
+
+    print("\n" + "=" * 80)
+    print("TAIL PERCENTILES (ms)")
+    print("=" * 80)
+    print(f"{'Metric':<36}" + "".join(f"{f'p{q:g}':>9}" for q in TAIL_PERCENTILES))
+    print("-" * 99)
+    for result in latency_results:
+        values = result.percentiles(TAIL_PERCENTILES)
+        print(f"{result.name:<36}" + "".join(f"{value:>9.2f}" for value in values))
+
+
+def result_to_dict(result: BenchmarkResult | HistogramResult) -> dict:
+    """JSON-ready form of a result: raw samples (or encoded histogram) plus stats."""
+    data = {"name": result.name, "unit": result.unit}
+    if isinstance(result, HistogramResult):
+        data["histogram"] = result.encode()
+    else:
+        data["samples"] = result.samples
+    for stat in ("mean", "median", "std_dev", "min", "max", "p95", "p99"):
+        data[stat] = getattr(result, stat)
+    return data
+
+
+def result_from_dict(data: dict) -> BenchmarkResult | HistogramResult:
+    if "histogram" in data:
+        return HistogramResult.decode(data["name"], data["histogram"])
+    return BenchmarkResult(data["name"], data["samples"], data["unit"])
+
+
+def save_results(results: dict, path: str) -> None:
+    """Write results as JSON so they can be re-analyzed without re-running."""
+    data = {}
+    for key, value in results.items():
+        if key == "concurrent":
+            data[key] = [list(point) for point in value]
+        elif isinstance(value, tuple):
+            data[key] = [result_to_dict(result) for result in value]
+        else:
+            data[key] = result_to_dict(value)
+    with open(path, "w") as f:
+        json.dump(data, f, indent=2)
+
+
+def load_results(path: str) -> dict:
+    """Read results written by save_results."""
+    with open(path) as f:
+        data = json.load(f)
+    results = {}
+    for key, value in data.items():
+        if key == "concurrent":
+            results[key] = [tuple(point) for point in value]
+        elif isinstance(value, list):
+            results[key] = tuple(result_from_dict(result) for result in value)
+        else:
+            results[key] = result_from_dict(value)
+    return results
+
+
 def main():
     parser = argparse.ArgumentParser(description="Benchmark agentbox")
     parser.add_argument("--cold-start-iterations", type=int, default=10)
     parser.add_argument("--exec-iterations", type=int, default=50)
     parser.add_argument("--memory-sessions", type=int, default=5)
     parser.add_argument("--max-concurrent", type=int, default=20)
+    parser.add_argument("--channels", type=int, default=4)
+    parser.add_argument(
+        "--warmup",
+        type=int,
+        default=WARMUP_ITERATIONS,
+        help="Untimed iterations run before each benchmark records samples",
+    )
+    parser.add_argument(
+        "--streaming-stats",
+        action="store_true",
+        help="Keep exec latencies in an HDR histogram (constant memory)",
+    )
+    parser.add_argument(
+        "--exec-stream",
+        action="store_true",
+        help="Also time ExecStream (first chunk and full stream)",
+    )
+    parser.add_argument(
+        "--exec-raw",
+        action="store_true",
+        help="Also time Exec as raw bytes to separate transport from protobuf cost",
+    )
+    parser.add_argument(
+        "--tail-percentiles",
+        action="store_true",
+        help=f"Also print p{', p'.join(f'{q:g}' for q in TAIL_PERCENTILES)} for latency results",
+    )
+    parser.add_argument("--json", metavar="PATH", help="Also write the results to PATH as JSON")
+    parser.add_argument(
+        "--from-json",
+        metavar="PATH",
+        help="Skip running and summarize results saved earlier with --json",
+    )
     parser.add_argument("--skip", nargs="*", choices=["cold", "exec", "memory", "concurrent"], default=[])
     args = parser.parse_args()
 
+    if args.from_json:
+        results = load_results(args.from_json)
+        print_summary(results)
+        if args.tail_percentiles:
+            print_tail_percentiles(results)
+        return
+
     stub = get_stub()
     results = {}
 
@@ -336,18 +888,34 @@ def main():
     print("=" * 80)
 
     if "cold" not in args.skip:
-        results["cold_start"] = benchmark_cold_start(stub, args.cold_start_iterations)
+        results["cold_start"] = benchmark_cold_start(
+            stub, args.cold_start_iterations, args.warmup
+        )
 
     if "exec" not in args.skip:
-        results["exec"] = benchmark_exec_latency(stub, args.exec_iterations)
+        results["exec"] = benchmark_exec_latency(
+            stub, args.exec_iterations, streaming=args.streaming_stats, warmup=args.warmup
+        )
+        if args.exec_stream:
+            results["exec_stream"] = benchmark_exec_stream_latency(
+                stub, args.exec_iterations, args.warmup
+            )
+        if args.exec_raw:
+            results["exec_raw"] = benchmark_exec_raw(args.exec_iterations, args.warmup)
 
     if "memory" not in args.skip:
         results["memory"] = benchmark_memory_overhead(stub, args.memory_sessions)
 
     if "concurrent" not in args.skip:
-        results["concurrent"] = benchmark_concurrent_sessions(stub, args.max_concurrent)
+        results["concurrent"] = benchmark_concurrent_sessions(
+            stub, args.max_concurrent, channels=args.channels, warmup=args.warmup
+        )
 
+    if args.json:
+        save_results(results, args.json)
     print_summary(results)
+    if args.tail_percentiles:
+        print_tail_percentiles(results)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,276 @@
+"""Tests for the egress proxy, run against a local upstream server.
+
+Run with:
+    pytest tests/test_egress_proxy.py -v
+"""
+
+import asyncio
+import base64
+import hashlib
+import hmac
+import json
+import signal
+import socket
+import sys
+import time
+from types import SimpleNamespace
+from unittest import mock
+
+import aiohttp
+import pytest
+from aiohttp import web
+
+from agentbox import egress_proxy
+from agentbox.egress_proxy import EgressProxy, _compile_allowlist
+
+
+def _b64url(data: bytes) -> str:
+    return base64.urlsafe_b64encode(data).rstrip(b"=").decode()
+
+
+def proxy_token(key: str = "test-key", expires_in: int = 60, **claims) -> str:
+    """HS256 JWT with the given claims, as the sandbox manager issues them."""
+    header = _b64url(b'{"alg":"HS256","typ":"JWT"}')
+    payload = _b64url(json.dumps({"exp": int(time.time()) + expires_in, **claims}).encode())
+    signature = hmac.digest(key.encode(), f"{header}.{payload}".encode(), hashlib.sha256)
+    return f"{header}.{payload}.{_b64url(signature)}"
+
+
+def proxy_auth(key: str = "test-key", expires_in: int = 60, **claims) -> str:
+    """Proxy-Authorization header carrying a proxy_token()."""
+    token = proxy_token(key, expires_in, **claims)
+    return "Basic " + base64.b64encode(f"sandbox:jwt_{token}".encode()).decode()
+
+
+@pytest.fixture
+async def upstream():
+    """Local HTTP server that echoes request bodies and selected headers."""
+
+    async def echo(request: web.Request) -> web.Response:
+        return web.json_response({
+            "body": (await request.read()).decode(),
+            "transfer_encoding": request.headers.get("Transfer-Encoding"),
+            "x_hop": request.headers.get("X-Hop"),
+        })
+
+    app = web.Application()
+    app.router.add_post("/echo", echo)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", 0)
+    await site.start()
+    port = runner.addresses[0][1]
+    yield f"http://127.0.0.1:{port}"
+    await runner.cleanup()
+
+
+@pytest.fixture
+async def proxy_url():
+    """Egress proxy on a free local port, allowing 127.0.0.1."""
+    proxy = EgressProxy(signing_key="test-key", default_allowed_hosts=["127.0.0.1"])
+    server = await proxy.start("127.0.0.1", 0)
+    port = server.sockets[0].getsockname()[1]
+    yield f"http://127.0.0.1:{port}"
+    await proxy.stop()
+
+
+async def test_chunked_post_is_forwarded(upstream, proxy_url):
+    """A chunked upload reaches upstream intact, re-framed by the proxy."""
+
+    async def body():
+        for part in (b"hello ", b"chunked ", b"world"):
+            yield part
+
+    async with aiohttp.ClientSession() as session:
+        async with session.post(
+            f"{upstream}/echo",
+            data=body(),
+            proxy=proxy_url,
+            headers={"Connection": "X-Hop", "X-Hop": "1"},
+        ) as response:
+            assert response.status == 200
+            result = await response.json()
+
+    assert result["body"] == "hello chunked world"
+    assert result["transfer_encoding"] == "chunked"
+    # Headers named by Connection are hop-by-hop too
+    assert result["x_hop"] is None
+
+
+@pytest.mark.parametrize("client", [None, "idle", "keep-alive"])
+async def test_sigterm_shuts_down_cleanly(client):
+    """SIGTERM stops the proxy cleanly, even with a client connection open."""
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        port = sock.getsockname()[1]
+
+    process = await asyncio.create_subprocess_exec(
+        sys.executable, "-m", "agentbox.egress_proxy",
+        "--host", "127.0.0.1", "--port", str(port), "--signing-key", "test-key",
+        stderr=asyncio.subprocess.PIPE,
+    )
+    writer = None
+    try:
+        for _ in range(100):
+            try:
+                reader, writer = await asyncio.open_connection("127.0.0.1", port)
+            except OSError:
+                await asyncio.sleep(0.05)
+                continue
+            break
+        else:
+            pytest.fail("proxy did not start listening")
+
+        if client is None:
+            writer.close()
+        elif client == "keep-alive":
+            # A finished request leaves the connection idle in aiohttp
+            writer.write(b"GET http://blocked.invalid/ HTTP/1.1\r\nHost: blocked.invalid\r\n\r\n")
+            head = await reader.readuntil(b"\r\n\r\n")
+            assert head.startswith(b"HTTP/1.1 403")
+
+        process.send_signal(signal.SIGTERM)
+        _, stderr = await asyncio.wait_for(process.communicate(), timeout=5)
+    finally:
+        if writer is not None:
+            writer.close()
+        if process.returncode is None:
+            process.kill()
+            await process.wait()
+
+    assert process.returncode == 0
+    assert b"Egress proxy stopped" in stderr
+
+
+async def test_stop_closes_open_tunnel(upstream):
+    """stop() returns promptly while a CONNECT tunnel is open, closing it."""
+    proxy = EgressProxy(signing_key="test-key", default_allowed_hosts=["127.0.0.1"])
+    server = await proxy.start("127.0.0.1", 0)
+    reader, writer = await asyncio.open_connection(*server.sockets[0].getsockname()[:2])
+    target = upstream.removeprefix("http://")
+    writer.write(f"CONNECT {target} HTTP/1.1\r\nHost: {target}\r\n\r\n".encode())
+    assert (await reader.readuntil(b"\r\n\r\n")).startswith(b"HTTP/1.1 200")
+
+    await asyncio.wait_for(proxy.stop(), timeout=5)
+    assert await asyncio.wait_for(reader.read(), timeout=5) == b""
+    writer.close()
+
+
+async def test_jwt_allowlist_applies_to_requests(upstream, proxy_url):
+    """A JWT's allowlist replaces the defaults, on first use and from the cache."""
+    allowed = proxy_auth(allowed_hosts=["127.0.0.1"])
+    denied = proxy_auth(allowed_hosts=["example.com"])
+
+    async with aiohttp.ClientSession() as session:
+        for _ in range(2):
+            for auth, status in ((allowed, 200), (denied, 403)):
+                async with session.post(
+                    f"{upstream}/echo",
+                    data=b"x",
+                    proxy=proxy_url,
+                    headers={"Proxy-Authorization": auth},
+                ) as response:
+                    assert response.status == status
+
+
+def test_verified_jwt_is_cached():
+    """Repeated headers reuse the first verification's allowlist."""
+    proxy = EgressProxy(signing_key="test-key")
+    header = proxy_auth(allowed_hosts=["example.com"])
+
+    with mock.patch.object(proxy, "_verify_jwt", wraps=proxy._verify_jwt) as verify:
+        allowlist = proxy._get_allowed_hosts(header)
+        assert proxy._get_allowed_hosts(header) is allowlist
+    assert verify.call_count == 1
+    assert proxy._is_host_allowed("example.com", allowlist)
+
+
+def test_expired_jwt_is_dropped_from_cache(monkeypatch):
+    """A cached JWT stops applying once its exp passes."""
+    proxy = EgressProxy(signing_key="test-key")
+    header = proxy_auth(expires_in=60, allowed_hosts=["example.com"])
+    assert proxy._is_host_allowed("example.com", proxy._get_allowed_hosts(header))
+
+    later = time.time() + 120
+    monkeypatch.setattr(egress_proxy, "time", SimpleNamespace(time=lambda: later))
+    assert proxy._get_allowed_hosts(header) is proxy._default_allowlist
+    assert header not in proxy._jwt_cache
+
+
+@pytest.mark.parametrize(
+    "header",
+    [
+        proxy_auth(key="other-key", allowed_hosts=["example.com"]),
+        proxy_auth(expires_in=-60, allowed_hosts=["example.com"]),
+        "Basic bm90LWEtand0",
+    ],
+    ids=["bad-signature", "expired", "no-token"],
+)
+def test_rejected_jwt_is_not_cached(header):
+    """Headers that fail verification fall back to the defaults and aren't cached."""
+    proxy = EgressProxy(signing_key="test-key")
+    assert proxy._get_allowed_hosts(header) is proxy._default_allowlist
+    assert not proxy._jwt_cache
+
+
+def test_jwt_cache_evicts_least_recently_used(monkeypatch):
+    """The cache holds JWT_CACHE_SIZE headers, evicting the least recently used."""
+    monkeypatch.setattr(egress_proxy, "JWT_CACHE_SIZE", 2)
+    proxy = EgressProxy(signing_key="test-key")
+    first, second, third = (proxy_auth(allowed_hosts=[f"{n}.example.com"]) for n in range(3))
+
+    for header in (first, second, first, third):
+        proxy._get_allowed_hosts(header)
+    assert list(proxy._jwt_cache) == [first, third]
+
+
+@pytest.mark.parametrize(
+    "host, allowed",
+    [
+        ("sub.example.com", True),
+        ("a.b.example.com", True),
+        ("example.com", True),
+        ("SUB.Example.COM:443", True),
+        ("badexample.com", False),
+        ("example.com.evil", False),
+        ("pypi.org", True),
+        ("files.pypi.org", False),
+    ],
+)
+def test_wildcard_allowlist(host, allowed):
+    """*.example.com allows its subdomains and the bare domain, case-insensitively."""
+    allowlist = _compile_allowlist(["*.Example.com", "pypi.org"])
+    assert EgressProxy(signing_key="test-key")._is_host_allowed(host, allowlist) is allowed
+
+
+@pytest.mark.parametrize(
+    "claim", [["pypi.org", "*.example.com"], "pypi.org, *.example.com"], ids=["list", "string"]
+)
+def test_jwt_allowlist_is_compiled(claim):
+    """allowed_hosts claims, as a list or comma-separated string, compile the same way."""
+    proxy = EgressProxy(signing_key="test-key")
+    allowlist = proxy._get_allowed_hosts(proxy_auth(allowed_hosts=claim))
+    assert allowlist == _compile_allowlist(["pypi.org", "*.example.com"])
+
+
+def test_jwt_without_allowlist_uses_defaults():
+    """A JWT without an allowed_hosts claim gets the precompiled defaults."""
+    proxy = EgressProxy(signing_key="test-key", default_allowed_hosts=["pypi.org"])
+    assert proxy._get_allowed_hosts(proxy_auth(session_id="s1")) is proxy._default_allowlist
+
+
+@pytest.mark.parametrize(
+    "host, allowed",
+    [
+        ("pypi.org", True),
+        ("PyPI.org:443", True),
+        ("files.pypi.org", False),
+        ("pypi.org.evil", False),
+        ("", False),
+    ],
+)
+def test_exact_allowlist(host, allowed):
+    """Allowlists without wildcards match whole host names only."""
+    allowlist = _compile_allowlist(["pypi.org", "github.com"])
+    assert allowlist[1] == ()
+    assert EgressProxy(signing_key="test-key")._is_host_allowed(host, allowlist) is allowed
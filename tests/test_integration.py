@@ -5,29 +5,49 @@ These tests require the gRPC server to be running:
 
 Run with:
     PYTHONPATH=gen/python pytest tests/test_integration.py -v
+
+Tests only block on the server, so they parallelize well with pytest-xdist
+(each worker creates its own shared session):
+    PYTHONPATH=gen/python pytest tests/test_integration.py -n 8
 """
 
 import pytest
 import grpc
 from sandbox.v1 import sandbox_pb2, sandbox_pb2_grpc
 
+# Splits the output of several checks batched into a single Exec
+SEPARATOR = "---SEP---"
 
-@pytest.fixture
+
+@pytest.fixture(scope="module")
 def stub():
     """Create a gRPC stub connected to the server."""
     channel = grpc.insecure_channel("localhost:50051")
     return sandbox_pb2_grpc.SandboxServiceStub(channel)
 
 
-@pytest.fixture
+@pytest.fixture(scope="module")
 def session(stub):
-    """Create a session and clean it up after the test."""
+    """Create one session shared by the module's tests and clean it up after."""
     response = stub.CreateSession(sandbox_pb2.CreateSessionRequest())
     session_id = response.session.session_id
     yield response.session
     stub.DestroySession(sandbox_pb2.DestroySessionRequest(session_id=session_id))
 
 
+@pytest.fixture
+def clean_workspace(stub, session):
+    """Empty the shared session's /workspace before a test that writes files."""
+    stub.Exec(
+        sandbox_pb2.ExecRequest(
+            session_id=session.session_id,
+            command="find /workspace -mindepth 1 -delete",
+            timeout=30,
+            workdir="/",
+        )
+    )
+
+
 class TestSessionLifecycle:
     """Test session creation and destruction."""
 
@@ -151,6 +171,99 @@ class TestExec:
         )
         assert response.exit_code == 42
 
+    def test_exec_stream(self, stub, session):
+        """Stream a command's output chunk by chunk."""
+        chunks = list(
+            stub.ExecStream(
+                sandbox_pb2.ExecStreamRequest(
+                    session_id=session.session_id,
+                    command="echo hello",
+                    workdir="/workspace",
+                )
+            )
+        )
+        stdout = "".join(c.data for c in chunks if c.type == "stdout")
+        assert stdout.strip() == "hello"
+        assert chunks[-1].type == "exit"
+        assert chunks[-1].exit_code == 0
+
+    @pytest.mark.parametrize(
+        "command", ["(sleep 0.5; echo LATE) &", "sh late.sh"], ids=["direct", "script"]
+    )
+    def test_exec_background_output_stays_with_its_command(self, stub, session, command):
+        """A background job's output belongs to the command that started it."""
+        stub.WriteFile(
+            sandbox_pb2.WriteFileRequest(
+                session_id=session.session_id,
+                path="late.sh",
+                content="(sleep 0.5; echo LATE) &\n",
+                mode="w",
+            )
+        )
+        response = stub.Exec(
+            sandbox_pb2.ExecRequest(
+                session_id=session.session_id,
+                command=command,
+                timeout=30,
+                workdir="/workspace",
+            )
+        )
+        assert response.stdout == "LATE\n"
+
+        response = stub.Exec(
+            sandbox_pb2.ExecRequest(
+                session_id=session.session_id,
+                command="echo next; true",
+                timeout=30,
+                workdir="/workspace",
+            )
+        )
+        assert response.stdout == "next\n"
+
+    @pytest.mark.parametrize(
+        "command", ["sleep 100 >/dev/null 2>&1 & echo $!", "sh bg.sh"], ids=["direct", "script"]
+    )
+    def test_exec_timeout_spares_earlier_background_jobs(self, stub, session, command):
+        """A timed-out command doesn't take down jobs started by earlier commands."""
+        stub.WriteFile(
+            sandbox_pb2.WriteFileRequest(
+                session_id=session.session_id,
+                path="bg.sh",
+                content="sleep 100 >/dev/null 2>&1 &\necho $!\n",
+                mode="w",
+            )
+        )
+        response = stub.Exec(
+            sandbox_pb2.ExecRequest(
+                session_id=session.session_id,
+                command=command,
+                timeout=30,
+                workdir="/workspace",
+            )
+        )
+        pid = int(response.stdout)
+
+        response = stub.Exec(
+            sandbox_pb2.ExecRequest(
+                session_id=session.session_id,
+                command="sleep 5",
+                timeout=1,
+                workdir="/workspace",
+            )
+        )
+        assert response.timed_out
+
+        # Alive means /proc still lists it and not as a zombie (state Z)
+        response = stub.Exec(
+            sandbox_pb2.ExecRequest(
+                session_id=session.session_id,
+                command=f"grep -v ') Z ' /proc/{pid}/stat >/dev/null && echo alive; kill {pid}",
+                timeout=30,
+                workdir="/workspace",
+            )
+        )
+        assert response.stdout == "alive\n"
+
     def test_exec_workdir(self, stub, session):
         """Execute a command in a specific directory."""
         response = stub.Exec(
@@ -165,6 +278,7 @@ class TestExec:
         assert response.stdout.strip() == "/tmp"
 
 
+@pytest.mark.usefixtures("clean_workspace")
 class TestFileOperations:
     """Test file read/write operations."""
 
@@ -224,6 +338,25 @@ class TestFileOperations:
         )
         assert response.content == "line1\nline2\n"
 
+    def test_overwrite_with_name_at_name_max(self, stub, session):
+        """A name too long for the temporary link still overwrites in place."""
+        path = "n" * 255
+        for content in ("first", "second"):
+            response = stub.WriteFile(
+                sandbox_pb2.WriteFileRequest(
+                    session_id=session.session_id,
+                    path=path,
+                    content=content,
+                    mode="w",
+                )
+            )
+            assert response.success, response.error
+
+        response = stub.ReadFile(
+            sandbox_pb2.ReadFileRequest(session_id=session.session_id, path=path)
+        )
+        assert response.content == "second"
+
     def test_write_python_and_execute(self, stub, session):
         """Write a Python script and execute it."""
         script = "print('Hello from script!')"
@@ -248,6 +381,34 @@ class TestFileOperations:
         assert response.exit_code == 0
         assert response.stdout.strip() == "Hello from script!"
 
+    def test_read_through_swapped_in_symlink_is_refused(self, stub, session):
+        """A directory replaced by a symlink out of /workspace is re-checked on every read."""
+        stub.WriteFile(
+            sandbox_pb2.WriteFileRequest(
+                session_id=session.session_id,
+                path="p/q/f",
+                content="inside",
+                mode="w",
+            )
+        )
+        response = stub.ReadFile(
+            sandbox_pb2.ReadFileRequest(session_id=session.session_id, path="p/q/f")
+        )
+        assert response.content == "inside"
+
+        stub.Exec(
+            sandbox_pb2.ExecRequest(
+                session_id=session.session_id,
+                command='out=$(mktemp -d) && mv p "$out/p" && ln -s "$out/p" p',
+                timeout=30,
+                workdir="/workspace",
+            )
+        )
+        response = stub.ReadFile(
+            sandbox_pb2.ReadFileRequest(session_id=session.session_id, path="p/q/f")
+        )
+        assert not response.success
+
     def test_read_nonexistent_file(self, stub, session):
         """Read a file that doesn't exist."""
         response = stub.ReadFile(
@@ -263,28 +424,18 @@ class TestFileOperations:
 class TestIsolation:
     """Test container isolation."""
 
-    def test_workspace_is_writable(self, stub, session):
-        """Verify /workspace is writable."""
-        response = stub.Exec(
-            sandbox_pb2.ExecRequest(
-                session_id=session.session_id,
-                command="touch /workspace/test && echo ok",
-                timeout=30,
-                workdir="/workspace",
-            )
-        )
-        assert response.exit_code == 0
-        assert response.stdout.strip() == "ok"
-
-    def test_python_available(self, stub, session):
-        """Verify Python is available."""
+    def test_environment_smoke(self, stub, session):
+        """Verify Python is available and /workspace is writable, in one exec."""
+        checks = ["python3 --version", "touch /workspace/test && echo ok"]
         response = stub.Exec(
             sandbox_pb2.ExecRequest(
                 session_id=session.session_id,
-                command="python3 --version",
+                command=f" && echo {SEPARATOR} && ".join(checks),
                 timeout=30,
                 workdir="/workspace",
             )
         )
         assert response.exit_code == 0
-        assert "Python 3" in response.stdout
+        python_version, workspace_writable = response.stdout.split(SEPARATOR)
+        assert "Python 3" in python_version
+        assert workspace_writable.strip() == "ok"
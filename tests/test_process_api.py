@@ -0,0 +1,255 @@
+"""Tests for process_api, run in-process without a container.
+
+Run with:
+    pytest tests/test_process_api.py -v
+"""
+
+import asyncio
+import gzip
+import os
+import subprocess
+
+import orjson
+import pytest
+from aiohttp.test_utils import TestClient, TestServer
+
+from sandbox import process_api
+from sandbox.process_api import ProcessAPI, ShellPool, SSEBatcher, builtin_result
+
+
+@pytest.fixture
+async def client():
+    """Test client for a ProcessAPI app without a shell pool."""
+    client = TestClient(TestServer(ProcessAPI(shell_pool_size=0).create_app()))
+    await client.start_server()
+    yield client
+    await client.close()
+
+
+@pytest.fixture
+def readable_tmp_path(tmp_path, monkeypatch):
+    """tmp_path, allowed as a read prefix for the file endpoints."""
+    monkeypatch.setattr(process_api, "READ_PREFIXES", (f"{tmp_path}/",))
+    return tmp_path
+
+
+@pytest.fixture
+async def shell_pool():
+    """A one-shell pool, closed after the test."""
+    pool = ShellPool(1)
+    yield pool
+    await pool.close()
+
+
+async def test_clean_shell_is_reused(shell_pool, tmp_path):
+    """A shell whose command left nothing behind goes back to the pool."""
+    result = orjson.loads(await shell_pool.run("echo hi", str(tmp_path), 5))
+    assert result["stdout"] == "hi\n"
+    assert len(shell_pool._idle) == 1
+
+
+@pytest.mark.parametrize(
+    "command",
+    [
+        "sleep 1 >/dev/null 2>&1 &",
+        "sh -c 'sleep 1 >/dev/null 2>&1 &'",
+        "setsid sleep 1 >/dev/null 2>&1 &",
+    ],
+)
+async def test_shell_with_leftovers_is_retired(shell_pool, tmp_path, command):
+    """Background jobs, including ones that left the process group, retire the shell."""
+    result = orjson.loads(await shell_pool.run(command, str(tmp_path), 5))
+    assert result["exit_code"] == 0
+    assert shell_pool._idle == []
+
+
+@pytest.mark.parametrize("command", ["sleep 1 >/dev/null 2>&1 &", "sh -c 'sleep 1 >/dev/null &'"])
+async def test_group_scan_fallback_finds_leftovers(shell_pool, tmp_path, command):
+    """Without child tracking, jobs still in the shell's process group are found."""
+    shell_pool._track_children = False
+    await shell_pool.run(command, str(tmp_path), 5)
+    assert shell_pool._idle == []
+
+
+@pytest.mark.parametrize("size", [10, process_api.GZIP_MAX_SIZE + 1])
+async def test_raw_read_ignores_precompressed_sibling(client, readable_tmp_path, size):
+    """A "<path>.gz" or "<path>.br" next to the file is never served in its place."""
+    content = b"x" * size
+    path = readable_tmp_path / "data.txt"
+    path.write_bytes(content)
+    (readable_tmp_path / "data.txt.gz").write_bytes(gzip.compress(b"sibling"))
+    (readable_tmp_path / "data.txt.br").write_bytes(b"sibling")
+
+    for _ in range(2):  # the connection stays usable after a sendfile
+        response = await client.get(
+            "/file/raw",
+            params={"path": str(path)},
+            headers={"Accept-Encoding": "br"},
+            auto_decompress=False,
+        )
+        assert response.status == 200
+        assert "Content-Encoding" not in response.headers
+        assert await response.read() == content
+
+
+def _wait_for_zombie(pid: int) -> None:
+    """Block until pid has exited but not been reaped."""
+    for _ in range(500):
+        with open(f"/proc/{pid}/stat") as f:
+            if f.read().rpartition(")")[2].split()[0] == "Z":
+                return
+        os.sched_yield()
+    pytest.fail(f"process {pid} did not exit")
+
+
+def test_child_reaper_leaves_tracked_children_alone():
+    """reap() collects untracked zombies but leaves tracked ones to their waiter."""
+    reaper = process_api.ChildReaper()
+    tracked = os.posix_spawnp("sh", ["sh", "-c", "exit 3"], os.environ)
+    reaper._tracked.add(tracked)
+    _wait_for_zombie(tracked)
+
+    reaper.reap()
+    assert os.waitpid(tracked, os.WNOHANG) == (tracked, 3 << 8)
+
+    untracked = os.posix_spawnp("true", ["true"], os.environ)
+    _wait_for_zombie(untracked)
+    reaper.reap()
+    with pytest.raises(ChildProcessError):
+        os.waitpid(untracked, os.WNOHANG)
+
+
+async def test_spawn_tracks_child_until_it_exits():
+    """spawn() registers the child's pid and releases it once the child is waited on."""
+    reaper = process_api.ChildReaper()
+    process = await reaper.spawn("sh", "-c", "sleep 0.05; exit 3")
+    assert reaper._tracked == {process.pid}
+    wait = asyncio.ensure_future(process.wait())
+    while not wait.done():
+        reaper.reap()
+        await asyncio.sleep(0.001)
+    assert wait.result() == 3
+    assert not reaper._tracked
+
+
+class RecordingResponse:
+    """Stands in for a StreamResponse; each write() records its data, then yields.
+
+    With error set, the first write raises it.
+    """
+
+    def __init__(self, delay: float = 0, error: Exception | None = None):
+        self.chunks: list[bytes] = []
+        self._delay = delay
+        self._error = error
+
+    async def write(self, data: bytes) -> None:
+        self.chunks.append(data)
+        await asyncio.sleep(self._delay)
+        error, self._error = self._error, None
+        if error is not None:
+            raise error
+
+
+async def test_sse_batcher_coalesces_frames():
+    """Small frames are held until SSE_FLUSH_DELAY, then written as one chunk."""
+    response = RecordingResponse()
+    batcher = SSEBatcher(response)
+    await batcher.add(b"a")
+    await batcher.add(b"b")
+    assert response.chunks == []
+
+    await asyncio.sleep(process_api.SSE_FLUSH_DELAY + 0.05)
+    assert response.chunks == [b"ab"]
+
+
+async def test_sse_batcher_flushes_at_size_limit():
+    """Reaching SSE_FLUSH_BYTES writes everything pending without waiting."""
+    response = RecordingResponse()
+    batcher = SSEBatcher(response)
+    big = b"x" * process_api.SSE_FLUSH_BYTES
+    await batcher.add(b"a")
+    await batcher.add(big)
+    assert response.chunks == [b"a" + big]
+
+
+async def test_sse_batcher_keeps_frame_order():
+    """Frames reach the response in add() order while a timed flush is still writing."""
+    response = RecordingResponse(delay=0.05)
+    batcher = SSEBatcher(response)
+    big = b"x" * process_api.SSE_FLUSH_BYTES
+
+    await batcher.add(b"first")
+    await asyncio.sleep(process_api.SSE_FLUSH_DELAY + 0.02)  # timed flush is mid-write
+    await batcher.add(big)
+    await batcher.add(b"last")
+    await batcher.flush()
+
+    assert response.chunks == [b"first", big, b"last"]
+
+
+@pytest.mark.parametrize("timed_flushes", [1, 2])
+async def test_sse_batcher_reraises_timed_flush_error(timed_flushes):
+    """An error from a timed flush surfaces from the next flush(), even after another one."""
+    batcher = SSEBatcher(RecordingResponse(error=ConnectionResetError()))
+    for _ in range(timed_flushes):
+        await batcher.add(b"a")
+        await asyncio.sleep(process_api.SSE_FLUSH_DELAY + 0.05)
+    with pytest.raises(ConnectionResetError):
+        await batcher.flush()
+
+
+@pytest.mark.parametrize(
+    "command",
+    [
+        "echo hello world",
+        "echo",
+        "echo  a \t b ",
+        "echo 100% a=b,c:d/e@f+g",
+        "pwd",
+        "true",
+        "false",
+    ],
+)
+def test_builtin_result_matches_shell(tmp_path, command):
+    """Builtins answered without a shell produce what /bin/sh would."""
+    result = orjson.loads(builtin_result(command, str(tmp_path)))
+    shell = subprocess.run(["/bin/sh", "-c", command], cwd=tmp_path, capture_output=True)
+    assert result == {
+        "exit_code": shell.returncode,
+        "stdout": shell.stdout.decode(),
+        "stderr": "",
+        "timed_out": False,
+    }
+
+
+@pytest.mark.parametrize(
+    "command",
+    [
+        "",
+        "ls",
+        "echo -n hi",
+        "echo a -e",
+        "echo $HOME",
+        "echo *",
+        "echo ~",
+        "echo 'quoted'",
+        "echo a; ls",
+        "echo a > out",
+        "pwd -P",
+        "true 1",
+    ],
+)
+def test_builtin_result_defers_to_shell(tmp_path, command):
+    """Options, expansions, quoting and other commands are left to a real shell."""
+    assert builtin_result(command, str(tmp_path)) is None
+
+
+async def test_exec_builtin_needs_existing_workdir(client, tmp_path):
+    """/exec answers builtins directly, but a missing workdir still errors."""
+    response = await client.post("/exec", json={"command": "pwd", "workdir": str(tmp_path)})
+    assert (await response.json())["stdout"] == f"{tmp_path}\n"
+
+    missing = str(tmp_path / "missing")
+    response = await client.post("/exec", json={"command": "pwd", "workdir": missing})
+    assert (await response.json())["exit_code"] != 0
@@ -0,0 +1,148 @@
+"""Tests for SandboxManager bookkeeping, run without a Docker daemon.
+
+Run with:
+    pytest tests/test_sandbox_manager.py -v
+"""
+
+import heapq
+from unittest import mock
+
+import pytest
+
+from agentbox import sandbox_manager
+from agentbox.sandbox_manager import SandboxManager, SandboxSession
+
+
+class FakeContainer:
+    """Stands in for a docker Container; records its removal."""
+
+    short_id = "fake"
+    status = "running"
+
+    def __init__(self):
+        self.removed = False
+
+    def remove(self, force: bool = False) -> None:
+        self.removed = True
+
+
+class Clock:
+    """Replaces the time module in sandbox_manager with a settable time()."""
+
+    def __init__(self, now: float):
+        self.now = now
+
+    def time(self) -> float:
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock(1000.0)
+    monkeypatch.setattr(sandbox_manager, "time", clock)
+    return clock
+
+
+@pytest.fixture
+async def manager(monkeypatch):
+    """SandboxManager with a stubbed Docker client and a 10s session timeout."""
+    monkeypatch.setattr(sandbox_manager.docker, "from_env", lambda **kwargs: object())
+    manager = SandboxManager(session_timeout=10)
+    yield manager
+    await manager.stop()
+
+
+def add_session(manager: SandboxManager, session_id: str, now: float) -> SandboxSession:
+    """Register a session the way create_session does, without a container."""
+    session = SandboxSession(
+        session_id=session_id,
+        container=FakeContainer(),
+        created_at=now,
+        api_host="127.0.0.1",
+        api_port=0,
+        last_activity=now,
+    )
+    manager.sessions[session_id] = session
+    heapq.heappush(manager._expiry_heap, (now + manager.session_timeout, session_id))
+    return session
+
+
+async def test_cleanup_expires_idle_sessions(manager, clock):
+    """Idle sessions are destroyed; touched ones are re-queued at their new deadline."""
+    touched = add_session(manager, "touched", clock.now)
+    idle = add_session(manager, "idle", clock.now)
+
+    clock.now = 1008.0
+    await manager.get_session("touched")
+    clock.now = 1011.0
+    await manager._cleanup_expired()
+
+    assert list(manager.sessions) == ["touched"]
+    assert idle.container.removed and not touched.container.removed
+    assert manager._expiry_heap == [(1018.0, "touched")]
+
+    clock.now = 1019.0
+    await manager._cleanup_expired()
+    assert not manager.sessions
+    assert touched.container.removed
+    assert manager._expiry_heap == []
+
+
+async def test_cleanup_leaves_sessions_before_deadline(manager, clock):
+    """Entries not yet due stay queued and their sessions untouched."""
+    session = add_session(manager, "s1", clock.now)
+    clock.now = 1009.0
+    await manager._cleanup_expired()
+    assert manager.sessions == {"s1": session}
+    assert manager._expiry_heap == [(1010.0, "s1")]
+
+
+async def test_cleanup_skips_stale_entries(manager, clock):
+    """A destroyed session's entry doesn't expire a later session with the same id."""
+    old = add_session(manager, "s1", clock.now)
+    await manager.destroy_session("s1")
+    clock.now = 1005.0
+    new = add_session(manager, "s1", clock.now)
+
+    clock.now = 1011.0
+    await manager._cleanup_expired()
+    assert old.container.removed
+    assert manager.sessions == {"s1": new}
+    assert not new.container.removed
+
+
+@pytest.mark.parametrize("pkg", ["requests", "zope.interface", "typing_extensions", "pkg-1.0", "a"])
+def test_bare_pip_names_skip_the_regex(pkg):
+    """Bare package names are accepted by the character check alone."""
+    with mock.patch.object(SandboxManager, "_PIP_PACKAGE_PATTERN") as pattern:
+        assert SandboxManager._is_valid_pip_package(pkg)
+    pattern.fullmatch.assert_not_called()
+
+
+@pytest.mark.parametrize(
+    "pkg", ["requests[socks]", "numpy>=1.26", "django~=4.2", "pandas[excel,perf]==2.1.*"]
+)
+def test_pip_specifiers_use_the_regex(pkg):
+    """Extras and version specifiers are validated by the PEP 508 pattern."""
+    assert SandboxManager._is_valid_pip_package(pkg)
+
+
+@pytest.mark.parametrize(
+    "pkg",
+    [
+        "",
+        "-e",
+        ".hidden",
+        "_private",
+        "pkg\n",
+        "numpy>=1.0\n",
+        "pkg name",
+        "requests; rm -rf /",
+        "pkg[extra",
+        "\u00fcnicode",
+        "n\u00fcmpy",
+    ],
+)
+def test_invalid_pip_packages_are_rejected(pkg):
+    """Leading punctuation, trailing newlines, shell syntax and non-ASCII are refused."""
+    assert not SandboxManager._is_valid_pip_package(pkg)